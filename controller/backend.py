@@ -0,0 +1,163 @@
+"""
+Links to the chip.
+
+A backend runs bursts of SPI frames: `exchange(tx, n)` sends the 4-byte word
+`tx` in each of `n` frames and returns the 4 * n bytes read back;
+`exchange_words(words)` sends its own 32-bit word in each frame.
+
+FtdiBackend  the board, through an FT232H and pyftdi (burst.py)
+SimBackend   the software model of top.v (dda.Top), at CPU speed, no
+             hardware or pyftdi needed
+
+    backend = open_backend("ftdi://ftdi:232h:1/1")   # or open_backend("sim")
+"""
+import numpy as np
+
+from dda import IC, Top
+from burst import BurstSpi
+
+URL = "ftdi://ftdi:232h:1/1"
+
+try:
+    from pyftdi.usbtools import UsbToolsError
+
+    # what a link can fail with while running (pyftdi and pyusb errors are IOErrors)
+    LINK_ERRORS = (IOError, UsbToolsError)
+except ImportError:
+    LINK_ERRORS = (IOError,)
+
+
+class BackendError(IOError):
+    """the backend could not be opened"""
+
+
+class Backend:
+    # SPI clock (Hz)
+    frequency = 0.0
+    # what the board is known by (tune.py saves its clock under it)
+    serial = None
+
+    def set_frequency(self, freq):
+        self.frequency = freq
+
+    def exchange(self, tx, n):
+        raise NotImplementedError
+
+    def exchange_words(self, words):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FtdiBackend(Backend):
+    def __init__(self, url=URL, freq=1e6, cs=0, mode=0):
+        try:
+            from pyftdi.spi import SpiController
+            from pyftdi.usbtools import UsbToolsError
+        except ImportError as err:
+            raise BackendError(f"pyftdi is needed for {url}: {err}") from err
+
+        self.url = url
+        self.spi_ctrl = SpiController()
+        try:
+            self.spi_ctrl.configure(url)
+            self.spi_ctrl.flush()
+            self.spi = self.spi_ctrl.get_port(cs=cs, freq=freq, mode=mode)
+        except (UsbToolsError, ValueError) as err:
+            raise BackendError(f"{url}: {err}") from err
+        self.serial = self._serial(self.spi_ctrl.ftdi.usb_dev)
+        self._bursts = {}
+
+    @staticmethod
+    def _serial(dev):
+        # the serial number, or bus:address without one, as in `discover`
+        from pyftdi.usbtools import UsbTools
+
+        serial = UsbTools.get_string(dev, dev.iSerialNumber) if dev.iSerialNumber else None
+        return serial or f"{dev.bus:x}:{dev.address:x}"
+
+    @property
+    def frequency(self):
+        return self.spi.frequency
+
+    def set_frequency(self, freq):
+        self.spi.set_frequency(freq)
+
+    def exchange(self, tx, n):
+        tx = bytes(tx)
+        if tx not in self._bursts:
+            self._bursts[tx] = BurstSpi.from_port(self.spi, tx)
+        return self._bursts[tx].exchange(n)
+
+    def exchange_words(self, words):
+        if None not in self._bursts:
+            self._bursts[None] = BurstSpi.from_port(self.spi, bytes(4))
+        return self._bursts[None].exchange_words(words)
+
+    def close(self):
+        self.spi_ctrl.terminate()
+
+
+class SimBackend(Backend):
+    """
+    A chip fresh out of reset, modeled by `dda.Top` with the same SPI
+    semantics: {x, y} captured at CS start, the DDA stepping on every other
+    frame and mu taking effect one frame after it is sent. `mu` is the word
+    assumed in r_mu before the first frame.
+
+    Above `max_frequency` (Hz) the link flips one random bit read back in
+    every `1 / error_rate` frames, like a board clocked too fast.
+    """
+
+    serial = "sim"
+
+    def __init__(self, mu=0, icx=IC, icy=IC, freq=1e6, max_frequency=None, error_rate=1e-3):
+        self.top = Top(mu, icx, icy)
+        self.frequency = freq
+        self.max_frequency = max_frequency
+        self.error_rate = error_rate
+        self._rng = np.random.default_rng()
+
+    def _link(self, words):
+        if self.max_frequency is not None and self.frequency > self.max_frequency:
+            hit = self._rng.random(len(words)) < self.error_rate
+            words[hit] ^= np.uint32(1) << self._rng.integers(0, 32, hit.sum()).astype(np.uint32)
+        return bytearray(words.astype(">u4").tobytes())
+
+    def exchange(self, tx, n):
+        return self._link(self.top.burst(int.from_bytes(tx, byteorder="big"), n))
+
+    def exchange_words(self, words):
+        return self._link(self.top.burst_words(words))
+
+
+def discover():
+    """urls of all the FT232H on the host (ftdi://ftdi:232h:*/1), by serial number when there is one"""
+    try:
+        from pyftdi.ftdi import Ftdi
+    except ImportError:
+        return []
+    try:
+        devices = Ftdi.list_devices("ftdi://ftdi:232h/1")
+    except LINK_ERRORS + (ValueError,):
+        # no libusb backend
+        return []
+    urls = []
+    for desc, _ in devices:
+        device = desc.sn if desc.sn else f"{desc.bus:x}:{desc.address:x}"
+        urls.append(f"ftdi://ftdi:232h:{device}/1")
+    return urls
+
+
+def open_backend(url=URL, freq=1e6):
+    """SimBackend for "sim", FtdiBackend for an ftdi:// url"""
+    if url == "sim":
+        return SimBackend(freq=freq)
+    return FtdiBackend(url, freq)
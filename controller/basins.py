@@ -0,0 +1,185 @@
+"""
+Attractors and basins of the DDA over its whole state space.
+
+For a given mu the dda module is a map f on the 2 ** 32 states (x, y), so
+every initial condition ends up on a cycle. `map_basins` finds, for every
+state, which cycle it falls into:
+
+1. successor.npy: f(s) for every s, computed with `dda.successor`.
+2. pointer jumping: after k passes jump[s] = f^(2^k)(s) and low[s] is the
+   smallest state among s, f(s), ..., f^(2^k - 1)(s). Once 2^k is at least
+   transient + period, jump[s] is on the cycle of s and low[jump[s]] is the
+   smallest state of that cycle, which names the attractor.
+3. attractor.npy: that name for every s.
+
+All arrays are uint32 .npy files memory-mapped from `directory` (16 GiB each,
+up to 96 GiB before the jump buffers are removed). Work is cut in chunks of
+`chunk` states spread over a process pool, so RAM use only depends on chunk
+and workers: computing the successors of a chunk peaks at about 500 bytes per
+state in each worker, 128 MiB at the default CHUNK.
+
+Usage:
+    python basins.py mu directory [--workers 8] [--passes 32]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from posit import encode_array
+from dda import N, ES, find_cycle, pack, successor, unpack
+
+STATES = 1 << (2 * N)
+
+# states per task
+CHUNK = 1 << 18
+
+
+def _create(path, n):
+    return np.lib.format.open_memmap(path, mode="w+", dtype=np.uint32, shape=(n,))
+
+
+def _states(start, stop):
+    return np.arange(start, stop, dtype=np.int64).astype(np.uint32)
+
+
+def _successor_chunk(mu, out_path, start, stop):
+    out = np.load(out_path, mmap_mode="r+")
+    out[start:stop] = successor(mu, _states(start, stop))
+    out.flush()
+    return stop - start
+
+
+def _jump_chunk(jump_path, low_path, jump_out, low_out, start, stop):
+    jump = np.load(jump_path, mmap_mode="r")
+    j = jump[start:stop]
+    # on the first pass low is the identity and needs no file
+    if low_path is None:
+        low, low_j = _states(start, stop), j
+    else:
+        low_map = np.load(low_path, mmap_mode="r")
+        low, low_j = low_map[start:stop], low_map[j]
+
+    out = np.load(jump_out, mmap_mode="r+")
+    out[start:stop] = jump[j]
+    out.flush()
+    out = np.load(low_out, mmap_mode="r+")
+    out[start:stop] = np.minimum(low, low_j)
+    out.flush()
+    return stop - start
+
+
+def _attractor_chunk(jump_path, low_path, out_path, start, stop):
+    low = np.load(low_path, mmap_mode="r")
+    out = np.load(out_path, mmap_mode="r+")
+    out[start:stop] = low[np.load(jump_path, mmap_mode="r")[start:stop]]
+    out.flush()
+    return stop - start
+
+
+def _run_chunks(what, fn, args, n, chunk, workers, progress):
+    start = time.monotonic()
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fn, *args, i, min(i + chunk, n)) for i in range(0, n, chunk)]
+        for future in as_completed(futures):
+            done += future.result()
+            if progress is not None:
+                progress(f"{what}: {done}/{n} states in {time.monotonic() - start:.0f} s")
+
+
+def label_attractors(successor_path, directory, passes=None, chunk=CHUNK, workers=None, progress=print):
+    """
+    Name the attractor of every state of the map stored in `successor_path`
+    (any uint32 .npy array mapping states to states).
+
+    Parameters:
+    passes: pointer jumping passes, default enough for any map of that size
+    (2 ** passes >= number of states). Fewer is fine if every transient +
+    period is known to be below 2 ** passes (e.g. from the cycle catalog).
+
+    Returns:
+    path of attractor.npy, holding for every state the smallest state of the
+    cycle it ends up on
+    """
+    n = len(np.load(successor_path, mmap_mode="r"))
+    if passes is None:
+        passes = max(n - 1, 1).bit_length()
+    if passes < 1:
+        raise ValueError("At least one pointer jumping pass is needed.")
+
+    jump, low = successor_path, None
+    buffers = [(os.path.join(directory, f"jump{i}.npy"), os.path.join(directory, f"low{i}.npy")) for i in range(2)]
+    for k in range(passes):
+        jump_out, low_out = buffers[k % 2]
+        _create(jump_out, n)
+        _create(low_out, n)
+        _run_chunks(f"pass {k + 1}/{passes}", _jump_chunk, (jump, low, jump_out, low_out), n, chunk, workers, progress)
+        jump, low = jump_out, low_out
+
+    attractor_path = os.path.join(directory, "attractor.npy")
+    _create(attractor_path, n)
+    _run_chunks("attractors", _attractor_chunk, (jump, low, attractor_path), n, chunk, workers, progress)
+    for path in (p for pair in buffers for p in pair):
+        if os.path.exists(path):
+            os.remove(path)
+    return attractor_path
+
+
+def basin_sizes(attractor_path, chunk=1 << 24):
+    """
+    Returns:
+    (attractors, sizes) arrays, the attractor names (see `label_attractors`)
+    and the number of states in their basin, largest basin first
+    """
+    attractor = np.load(attractor_path, mmap_mode="r")
+    counts = {}
+    for i in range(0, len(attractor), chunk):
+        names, sizes = np.unique(attractor[i : i + chunk], return_counts=True)
+        for name, size in zip(names.tolist(), sizes.tolist()):
+            counts[name] = counts.get(name, 0) + size
+    names = np.fromiter(counts.keys(), dtype=np.uint32, count=len(counts))
+    sizes = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+    order = np.argsort(-sizes, kind="stable")
+    return names[order], sizes[order]
+
+
+def attractor_of(attractor_path, icx, icy):
+    """attractor name of the initial condition(s) (icx, icy)"""
+    attractor = np.load(attractor_path, mmap_mode="r")
+    return attractor[pack(np.asarray(icx, dtype=np.uint32), np.asarray(icy, dtype=np.uint32))]
+
+
+def map_basins(mu, directory, passes=None, chunk=CHUNK, workers=None, progress=print):
+    """
+    Successor map, then attractor of every state, for the `mu` word. Files
+    are written to `directory` (see the module docstring for the disk space).
+
+    Returns:
+    path of attractor.npy
+    """
+    os.makedirs(directory, exist_ok=True)
+    successor_path = os.path.join(directory, "successor.npy")
+    _create(successor_path, STATES)
+    _run_chunks("successors", _successor_chunk, (mu, successor_path), STATES, chunk, workers, progress)
+    return label_attractors(successor_path, directory, passes, chunk, workers, progress)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Map the attractors of the DDA over all 2**32 states")
+    parser.add_argument("mu", type=float)
+    parser.add_argument("directory")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--passes", type=int, default=None, help="pointer jumping passes (default: 32)")
+    parser.add_argument("--chunk", type=int, default=CHUNK, help="states per task (about 500 bytes each per worker)")
+    args = parser.parse_args()
+
+    mu = int(encode_array(args.mu, N, ES))
+    attractor_path = map_basins(mu, args.directory, args.passes, args.chunk, args.workers)
+    names, sizes = basin_sizes(attractor_path)
+    for name, size in zip(names, sizes):
+        x, y = unpack(int(name))
+        period = find_cycle(mu, x, y).period
+        print(f"attractor {x:04x} {y:04x}: period {period}, basin {size} states ({size / STATES:.2%})")
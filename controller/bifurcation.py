@@ -0,0 +1,216 @@
+"""
+Bifurcation (amplitude vs mu) diagrams from the software model.
+
+Every mu of the grid is one lane of `dda.DdaLanes`, so a whole block of the
+grid is stepped with one vectorized clock. After `transient` clocks, the
+next `steps` states are recorded and cut with the Poincare section y = 0:
+x is taken, linearly interpolated, wherever y changes sign, i.e. at the
+extrema of x on the cycle. The last `keep` crossings of each mu are the
+points of the diagram (a limit cycle gives +-amplitude, a fixed point none,
+a lane that ends on NaR a row of NaN).
+
+From the initial conditions the model takes about 3000 / mu clocks to settle
+on its cycle (measured with `dda.find_cycle`), so by default the transient
+grows as mu gets small (`transient_steps`) and the grid is cut into blocks
+of mu that share a transient. The long ones hold few mu, which `dda.run`
+steps one at a time faster than `DdaLanes` does with its vectorized clock.
+
+Blocks are split over a process pool; every worker writes its rows straight
+into one result array in shared memory, nothing is pickled back but the row
+count.
+
+Usage:
+    python bifurcation.py diagram.npz --mu 0.1 5 2000 [--workers 8] [--plot]
+
+writes the mu values and the (len(mu), keep) crossings to diagram.npz.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from posit import decode_array, encode_array
+from dda import IC, N, ES, DdaLanes, run
+
+# clocks recorded per block of `crossings`
+BLOCK = 1024
+
+# shortest transient, clocks per unit of 1 / mu, longest transient
+TRANSIENT = 6144
+TRANSIENT_MU = 3072
+TRANSIENT_MAX = 1 << 16
+
+# posit (16,1) NaR
+NAR = 0x8000
+
+# up to this many lanes, stepping them one by one with `dda.run` is faster
+# than the vectorized clock of `DdaLanes`
+SCALAR_LANES = 64
+
+
+def transient_steps(mus):
+    """
+    Clocks to skip before recording, for each mu of `mus` (floats): about
+    TRANSIENT_MU / mu and at least TRANSIENT, rounded up to TRANSIENT times a
+    power of two so that few blocks are needed, at most TRANSIENT_MAX.
+    """
+    with np.errstate(divide="ignore"):
+        need = np.maximum(TRANSIENT, TRANSIENT_MU / np.abs(np.asarray(mus, dtype=float)))
+    return np.minimum(TRANSIENT * 2 ** np.ceil(np.log2(need / TRANSIENT)), TRANSIENT_MAX).astype(np.int64)
+
+
+def crossings(x, y):
+    """
+    Poincare section y = 0 of (steps, lanes) trajectories.
+
+    Returns:
+    (step, lane, x) arrays, one entry per crossing in step order; x linearly
+    interpolated between the states either side of the section
+    """
+    y0, y1 = y[:-1], y[1:]
+    hit = ((y0 > 0) & (y1 <= 0)) | ((y0 < 0) & (y1 >= 0))
+    step, lane = np.nonzero(hit)
+    x0, x1, y0, y1 = x[:-1][hit], x[1:][hit], y0[hit], y1[hit]
+    return step, lane, x0 + (x1 - x0) * y0 / (y0 - y1)
+
+
+def last_crossings(lane, x, lanes, keep):
+    """
+    (lanes, keep) array of the last `keep` crossings of each lane, from the
+    lane and x of `crossings` (in step order), the latest in the last column
+    and NaN where a lane crossed fewer times
+    """
+    out = np.full((lanes, keep), np.nan)
+    order = np.argsort(lane, kind="stable")
+    lane, x = lane[order], x[order]
+    counts = np.bincount(lane, minlength=lanes)
+    # position of each crossing counted from the last one of its lane
+    from_end = counts[lane] - 1 - (np.arange(len(lane)) - np.searchsorted(lane, lane))
+    kept = from_end < keep
+    out[lane[kept], keep - 1 - from_end[kept]] = x[kept]
+    return out
+
+
+def lane_crossings(mu, icx=IC, icy=IC, transient=TRANSIENT, steps=4096, keep=8):
+    """
+    Parameters:
+    mu: mu words, one lane each
+
+    Returns:
+    (len(mu), keep) float64 array, see `last_crossings`, with a row of NaN
+    for each lane that ends on NaR
+    """
+    if steps < 1:
+        raise ValueError("At least one step has to be recorded.")
+    mu, icx, icy = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=np.uint16)) for v in (mu, icx, icy)))
+    if len(mu) <= SCALAR_LANES:
+        states = np.stack([run(m, transient + steps, x, y)[transient:] for m, x, y in zip(mu, icx, icy)], axis=1)
+        blocks = (states[start : start + BLOCK] for start in range(0, steps, BLOCK))
+    else:
+        lanes = DdaLanes(mu, icx, icy)
+        lanes.advance(transient)
+        blocks = (lanes.run(min(BLOCK, steps - start)) for start in range(0, steps, BLOCK))
+    found_lane, found_x = [], []
+    previous = None
+    for xy in blocks:
+        last = xy[-1]
+        x, y = decode_array(xy[..., 0], N, ES), decode_array(xy[..., 1], N, ES)
+        if previous is not None:
+            # the crossings between two blocks
+            x, y = np.concatenate([previous[0], x]), np.concatenate([previous[1], y])
+        previous = x[-1:], y[-1:]
+        _, lane, xc = crossings(x, y)
+        found_lane.append(lane)
+        found_x.append(xc)
+    out = last_crossings(np.concatenate(found_lane), np.concatenate(found_x), len(mu), keep)
+    # NaR steps to NaR: the lane has left its cycle for good
+    out[(last[:, 0] == NAR) | (last[:, 1] == NAR)] = np.nan
+    return out
+
+
+def _crossings_block(name, shape, rows, mu, icx, icy, transient, steps, keep):
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        result = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        result[rows] = lane_crossings(mu, icx, icy, transient, steps, keep)
+        del result
+    finally:
+        shm.close()
+    return len(rows)
+
+
+def bifurcation(mus, icx=IC, icy=IC, transient=None, steps=4096, keep=8, workers=None, chunk=1024, progress=print):
+    """
+    Section crossings for every mu of `mus` (floats, encoded in posit (16,1)
+    like the controller does), over `workers` processes (default: all cores)
+    taking blocks of at most `chunk` mu. `transient` clocks are skipped for
+    every mu, `transient_steps(mus)` when None.
+
+    Returns:
+    (len(mus), keep) float64 array, see `lane_crossings`
+    """
+    mus = np.asarray(mus, dtype=float)
+    words = encode_array(mus, N, ES).astype(np.uint16)
+    transients = transient_steps(mus) if transient is None else np.full(len(mus), transient)
+    shape = (len(words), keep)
+    workers = workers or os.cpu_count()
+    # at least one block per worker
+    chunk = max(1, min(chunk, -(-len(words) // workers)))
+    blocks = []
+    for t in np.unique(transients):
+        rows = np.flatnonzero(transients == t)
+        blocks.extend((int(t), rows[i : i + chunk]) for i in range(0, len(rows), chunk))
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, 8 * shape[0] * shape[1]))
+    try:
+        result = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        result[:] = np.nan
+        finished, start_time = 0, time.monotonic()
+        # spawned, not forked: gui.py runs this from a worker thread
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [
+                pool.submit(_crossings_block, shm.name, shape, rows, words[rows], icx, icy, t, steps, keep)
+                for t, rows in blocks
+            ]
+            for future in as_completed(futures):
+                finished += future.result()
+                if progress is not None:
+                    progress(f"{finished}/{len(words)} mu in {time.monotonic() - start_time:.1f} s")
+        out = result.copy()
+        del result
+    finally:
+        shm.close()
+        shm.unlink()
+    return out
+
+
+def plot_diagram(axes, mus, x):
+    """one dot per crossing, at its mu"""
+    axes.plot(np.repeat(np.asarray(mus, dtype=float), x.shape[1]), x.ravel(), ",k")
+    axes.set_xlabel(r"$\mu$")
+    axes.set_ylabel("X at Y = 0")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bifurcation diagram of the DDA model over a mu grid")
+    parser.add_argument("path", help="output file (.npz with mu and x)")
+    parser.add_argument("--mu", type=float, nargs=3, metavar=("START", "STOP", "COUNT"), default=[0.1, 5, 1000])
+    parser.add_argument("--transient", type=int, default=None, help="clocks skipped before recording (default: by mu)")
+    parser.add_argument("--steps", type=int, default=4096, help="clocks recorded")
+    parser.add_argument("--keep", type=int, default=8, help="crossings kept per mu")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--plot", action="store_true", help="show the diagram")
+    args = parser.parse_args()
+
+    mus = np.linspace(args.mu[0], args.mu[1], int(args.mu[2]))
+    x = bifurcation(mus, transient=args.transient, steps=args.steps, keep=args.keep, workers=args.workers)
+    np.savez(args.path, mu=mus, x=x)
+    if args.plot:
+        import matplotlib.pyplot as plt
+
+        plot_diagram(plt.figure().add_subplot(), mus, x)
+        plt.show()
@@ -0,0 +1,141 @@
+"""
+Binary capture files.
+
+A capture is a 64-byte header followed by the (x, y) words exactly as the
+chip sends them: big-endian uint16 pairs, 4 bytes per frame. Chunks are only
+ever appended, so the frame count is given by the file size and the frames
+can be memory-mapped as they are:
+
+    header  HEADER_DTYPE, little-endian
+    frames  (n, 2) '>u2'
+
+Times are seconds since the epoch; stop_time is 0 until the writer is closed.
+"""
+import os
+import time
+
+import numpy as np
+
+from posit import decode_array
+from dda import IC
+
+MAGIC = b"DDAC"
+VERSION = 1
+
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "S4"),
+        ("version", "<u2"),
+        ("header_size", "<u2"),
+        ("size", "u1"),
+        ("es", "u1"),
+        ("mu", "<u2"),
+        ("icx", "<u2"),
+        ("icy", "<u2"),
+        ("spi_clock", "<f8"),
+        ("start_time", "<f8"),
+        ("stop_time", "<f8"),
+        ("reserved", "V24"),
+    ]
+)
+HEADER_SIZE = HEADER_DTYPE.itemsize
+
+FRAME_DTYPE = np.dtype(">u2")
+
+
+class CaptureWriter:
+    """
+    Appends frames to a capture file, (re)creating it with its header first,
+    or with `append`, continuing an existing file (its header is kept).
+
+    Can be used as a `pipeline.Pipeline` sink.
+    """
+
+    def __init__(self, path, mu, icx=IC, icy=IC, spi_clock=0.0, size=16, es=1, append=False):
+        self.path = path
+        if append and os.path.exists(path) and os.path.getsize(path) > 0:
+            self.header = read_header(path)
+            self.f = open(path, "r+b")
+            # drop a partial frame left by an interrupted write
+            frames = (os.path.getsize(path) - int(self.header["header_size"])) // (2 * FRAME_DTYPE.itemsize)
+            self.f.truncate(int(self.header["header_size"]) + frames * 2 * FRAME_DTYPE.itemsize)
+            self.f.seek(0, os.SEEK_END)
+        else:
+            self.header = np.zeros((), dtype=HEADER_DTYPE)
+            self.header["magic"] = MAGIC
+            self.header["version"] = VERSION
+            self.header["header_size"] = HEADER_SIZE
+            self.header["size"] = size
+            self.header["es"] = es
+            self.header["mu"] = mu
+            self.header["icx"] = icx
+            self.header["icy"] = icy
+            self.header["spi_clock"] = spi_clock
+            self.header["start_time"] = time.time()
+            self.f = open(path, "w+b")
+            self.f.write(self.header.tobytes())
+
+    def write(self, words):
+        """append (n, 2) x, y words"""
+        self.f.write(np.asarray(words, dtype=FRAME_DTYPE).tobytes())
+
+    def __call__(self, chunk):
+        self.write(chunk.words)
+
+    def close(self):
+        self.header["stop_time"] = time.time()
+        self.f.seek(0)
+        self.f.write(self.header.tobytes())
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_header(path):
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if len(header) != 1 or header[0]["magic"] != MAGIC:
+        raise ValueError(f"{path} is not a capture file.")
+    if header[0]["version"] > VERSION:
+        raise ValueError(f"{path}: capture version {header[0]['version']} is not supported.")
+    return header[0]
+
+
+def is_capture(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class Capture:
+    """
+    A capture file opened read-only.
+
+    header: HEADER_DTYPE record
+    words: (n, 2) big-endian uint16 memmap of the frames, no copy
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header = read_header(path)
+        offset = int(self.header["header_size"])
+        frames = (os.path.getsize(path) - offset) // (2 * FRAME_DTYPE.itemsize)
+        if frames:
+            self.words = np.memmap(path, dtype=FRAME_DTYPE, mode="r", offset=offset, shape=(frames, 2))
+        else:
+            self.words = np.empty((0, 2), dtype=FRAME_DTYPE)
+
+    def __len__(self):
+        return len(self.words)
+
+    def decode(self, start=0, stop=None):
+        """(x, y) float arrays of frames start:stop"""
+        words = self.words[start:stop]
+        size, es = int(self.header["size"]), int(self.header["es"])
+        return decode_array(words[:, 0], size, es), decode_array(words[:, 1], size, es)
+
+
+def open_capture(path):
+    return Capture(path)
@@ -0,0 +1,139 @@
+"""
+Catalog of the DDA limit cycle for every mu word.
+
+mu is a posit (16,1) word, so with fixed initial conditions there are only
+65536 distinct experiments. `build_catalog` runs `find_cycle` for each of
+them in a process pool and stores one record per mu word in a memory-mapped
+.npy file, indexed by the word itself:
+
+    transient, period          in DDA steps (period 0: no cycle within max_steps)
+    nar                        1 if the cycle is on NaR (the model overflowed)
+    amplitude                  max |x| over the cycle
+    x_min, x_max, y_min, y_max bounding box of the cycle
+
+amplitude and bounding box are NaN without a cycle and for NaR cycles, as in
+bifurcation.py; `limit_cycles` picks the records of real attractors.
+
+Usage:
+    python catalog.py catalog.npy [--workers 8] [--max-steps 1048576]
+
+An interrupted build resumes where it stopped when run again on the same file.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from posit import decode_array, encode_array
+from dda import IC, N, ES, find_cycle, unpack
+
+# posit (16,1) NaR
+NAR = 0x8000
+
+CATALOG_DTYPE = np.dtype(
+    [
+        ("done", "u1"),
+        ("transient", "<u4"),
+        ("period", "<u4"),
+        ("nar", "u1"),
+        ("amplitude", "<f8"),
+        ("x_min", "<f8"),
+        ("x_max", "<f8"),
+        ("y_min", "<f8"),
+        ("y_max", "<f8"),
+    ]
+)
+
+
+def cycle_stats(mu, icx=IC, icy=IC, max_steps=1 << 20):
+    """catalog record of a single mu word"""
+    rec = np.zeros((), dtype=CATALOG_DTYPE)
+    trajectory = find_cycle(mu, icx, icy, max_steps)
+    rec["done"] = 1
+    rec["transient"] = trajectory.transient
+    if trajectory.period is not None:
+        rec["period"] = trajectory.period
+        x, y = unpack(trajectory.cycle)
+        # NaR steps to NaR: a cycle through it is (NaR, NaR), not an attractor
+        rec["nar"] = np.any((x == NAR) | (y == NAR))
+    if trajectory.period is None or rec["nar"]:
+        for field in ("amplitude", "x_min", "x_max", "y_min", "y_max"):
+            rec[field] = np.nan
+        return rec
+
+    x, y = decode_array(x, N, ES), decode_array(y, N, ES)
+    rec["amplitude"] = np.abs(x).max()
+    rec["x_min"], rec["x_max"] = x.min(), x.max()
+    rec["y_min"], rec["y_max"] = y.min(), y.max()
+    return rec
+
+
+def _cycle_stats_chunk(mus, icx, icy, max_steps):
+    return mus, np.stack([cycle_stats(int(mu), icx, icy, max_steps) for mu in mus])
+
+
+def build_catalog(path, icx=IC, icy=IC, max_steps=1 << 20, workers=None, mus=None, chunk=64, progress=print):
+    """
+    Fill (or resume) the catalog file at `path` for the `mu` words given
+    (default: all of them). Returns the catalog, memory-mapped.
+    """
+    if os.path.exists(path):
+        catalog = np.load(path, mmap_mode="r+")
+        if catalog.dtype != CATALOG_DTYPE or catalog.shape != (1 << N,):
+            raise ValueError(f"{path} is not a DDA cycle catalog.")
+    else:
+        catalog = np.lib.format.open_memmap(path, mode="w+", dtype=CATALOG_DTYPE, shape=(1 << N,))
+
+    mus = np.arange(1 << N) if mus is None else np.asarray(mus)
+    todo = mus[catalog["done"][mus] == 0]
+    total, finished = len(todo), 0
+    start = time.monotonic()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_cycle_stats_chunk, todo[i : i + chunk], icx, icy, max_steps) for i in range(0, total, chunk)
+        ]
+        for future in as_completed(futures):
+            chunk_mus, records = future.result()
+            catalog[chunk_mus] = records
+            catalog.flush()
+            finished += len(chunk_mus)
+            if progress is not None:
+                elapsed = time.monotonic() - start
+                progress(f"{finished}/{total} mu words in {elapsed:.0f} s")
+    return catalog
+
+
+def open_catalog(path):
+    """read-only, memory-mapped catalog"""
+    return np.load(path, mmap_mode="r")
+
+
+def limit_cycles(catalog):
+    """mask of the records done with a cycle that is not on NaR"""
+    return (catalog["done"] == 1) & (catalog["period"] > 0) & (catalog["nar"] == 0)
+
+
+def lookup(catalog, mu):
+    """catalog record of the real value `mu` (encoded in posit (16,1) like the controller does)"""
+    return catalog[int(encode_array(mu, N, ES))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the per-mu DDA cycle catalog")
+    parser.add_argument("path", help="catalog file (.npy)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--max-steps", type=int, default=1 << 20, help="give up on a mu after this many steps")
+    args = parser.parse_args()
+    catalog = build_catalog(args.path, max_steps=args.max_steps, workers=args.workers)
+    done = catalog["done"] == 1
+    cycles = limit_cycles(catalog)
+    nar = done & (catalog["nar"] == 1)
+    print(
+        f"{done.sum()} mu words: {cycles.sum()} limit cycles "
+        f"(amplitude {np.min(catalog['amplitude'][cycles], initial=np.inf):g} "
+        f"to {np.max(catalog['amplitude'][cycles], initial=0):g}), "
+        f"{nar.sum()} on NaR, {(done & ~cycles & ~nar).sum()} without a cycle"
+    )
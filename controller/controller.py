@@ -1,30 +1,65 @@
-from pyftdi.spi import SpiController
-from posit import from_bits, from_double
+import sys
+import numpy as np
+from posit import from_double
+from dda import CycleDetector, pack
+from backend import URL
+from tune import open_tuned
+from pipeline import Pipeline, RateLimitedPrinter
+from capture import CaptureWriter
+from verify import Verifier
 
-spi_ctrl = SpiController()
-spi_ctrl.configure('ftdi://ftdi:232h:1/1')
-spi_ctrl.flush()
-
-# spi = spi_ctrl.get_port(0)
-# spi.set_frequency(1e5) # SCLK 
-spi = spi_ctrl.get_port(cs=0, freq=1E5, mode=0)
+# python controller.py [url]: the board by default, "sim" for the software model
+url = sys.argv[1] if len(sys.argv) > 1 else URL
+# SPI clock found by tune.py for this device, if it was calibrated
+backend = open_tuned(url, 1E5)
 
 mus = [ 0.0, 2.0, 5.0]
 N = 10000
 
-f_out = open("fpga.dat","w")
+# frames per USB transfer
+BURST = 1000
+# seconds between two progress lines on the terminal, None for none
+PRINT_INTERVAL = 1.0
+# check every frame against the model while acquiring
+VERIFY = True
+
 for mu in mus:
     p_mu = from_double(x=mu, size=16, es=1)
-    print("mu = ",p_mu.bit_repr().to_bytes(4,byteorder='big'))
-    for _ in range(N):
-        read_buf = spi.exchange(p_mu.bit_repr().to_bytes(4,byteorder='big'), duplex=True)
-        p_x = from_bits(int.from_bytes(read_buf[0:2],byteorder='big'),16,1)
-        p_y = from_bits(int.from_bytes(read_buf[2:4],byteorder='big'),16,1)
-        print("x = ",p_x.eval(),", y = ", p_y.eval())
-        f_out.write(f"{p_x.eval()}, {p_y.eval()}\n")
-        # spi.write(p_mu.bit_repr().to_bytes(2,byteorder='big'),True,False)
-        # recv_byte = spi.read(4,start=False,stop=True)
-        # print(recv_byte)
-        # p_x = from_bits(int.from_bytes(recv_byte,byteorder='big'),N,ES)
-        # print("x = ",p_x.eval())
-f_out.close()
\ No newline at end of file
+    tx = p_mu.bit_repr().to_bytes(4,byteorder='big')
+    print("mu = ",tx)
+    cycle = CycleDetector()
+    # raw words and run settings, see capture.py and plot.py
+    write = CaptureWriter(f"fpga_mu{mu}.dda", p_mu.bit_repr(), spi_clock=backend.frequency)
+    show = RateLimitedPrinter(PRINT_INTERVAL) if PRINT_INTERVAL else None
+    verify = Verifier(p_mu.bit_repr()) if VERIFY else None
+
+    def sink(chunk):
+        states = pack(chunk.words[:, 0].astype(np.uint32), chunk.words[:, 1].astype(np.uint32)).tolist()
+        end = len(states)
+        # The DDA advances on every other frame, so one frame out of two is one step.
+        # Once a state repeats the rest of the run is known: stop here.
+        for i in range(chunk.start % 2, end, 2):
+            if cycle.push(states[i]):
+                end = i + 1
+                break
+        chunk = chunk._replace(words=chunk.words[:end], x=chunk.x[:end], y=chunk.y[:end])
+        write(chunk)
+        if verify:
+            verify(chunk)
+        if show:
+            show(chunk)
+        if cycle.period is not None:
+            print(f"cycle found after {chunk.start+end} frames: transient = {cycle.transient}, period = {cycle.period} steps")
+            return True
+
+    Pipeline(lambda n: backend.exchange(tx, n), N, chunk=BURST).run(sink)
+    write.close()
+    if verify:
+        check = verify.check()
+        print(f"verified {check.frames} frames: {check.errors} wrong ({check.bit_errors} bits), first at frame {check.first}")
+    # spi.write(p_mu.bit_repr().to_bytes(2,byteorder='big'),True,False)
+    # recv_byte = spi.read(4,start=False,stop=True)
+    # print(recv_byte)
+    # p_x = from_bits(int.from_bytes(recv_byte,byteorder='big'),N,ES)
+    # print("x = ",p_x.eval())
+backend.close()
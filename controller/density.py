@@ -0,0 +1,127 @@
+"""
+Density rendering of long trajectories.
+
+Drawing every sample as a line costs time in the number of samples; a
+density raster costs time in the number of pixels. The trajectory is binned
+into a (height, width) count image over the current view with one bincount,
+and only the points inside the view are counted, so zooming in rebins at
+full resolution.
+
+`density_words` bins the posit words read from the chip directly: the bin
+of every one of the 2^16 words is looked up in a per-view table, so the
+samples are never decoded to floats.
+
+`DensityView` keeps the image of a matplotlib Axes up to date: new points
+are added to the counts as they arrive, the whole trajectory is rebinned
+only when the view (limits or size in pixels) changes.
+
+Usage:
+    python plot.py capture.dda --density
+"""
+import numpy as np
+from matplotlib.colors import LogNorm
+
+from posit import decode_table
+
+
+def _bins(v, lo, hi, n):
+    """bin of each value of `v` in `n` bins over [lo, hi), -1 outside (NaR included)"""
+    b = np.floor((v - lo) * (n / (hi - lo)))
+    return np.where((b >= 0) & (b < n), b, -1).astype(np.int64)
+
+
+def _count(bx, by, shape):
+    inside = (bx >= 0) & (by >= 0)
+    return np.bincount(by[inside] * shape[1] + bx[inside], minlength=shape[0] * shape[1]).reshape(shape)
+
+
+def density(x, y, xlim, ylim, shape):
+    """
+    Parameters:
+    x, y: float arrays
+    xlim, ylim: (min, max) of the view
+    shape: (height, width) of the image
+
+    Returns:
+    (height, width) int64 counts, row 0 at ylim[0]
+    """
+    height, width = shape
+    return _count(_bins(np.asarray(x), *xlim, width), _bins(np.asarray(y), *ylim, height), shape)
+
+
+def word_bins(xlim, ylim, shape, size=16, es=1):
+    """(x, y) tables: the bin of every posit word along each axis, -1 outside"""
+    table = decode_table(size, es)
+    height, width = shape
+    return _bins(table, *xlim, width), _bins(table, *ylim, height)
+
+
+def density_words(words, xlim, ylim, shape, size=16, es=1, bins=None):
+    """
+    `density` of (n, 2) x, y posit words (as read, see `burst.frames`);
+    `bins` from `word_bins` can be passed to reuse the tables of the view.
+    """
+    if bins is None:
+        bins = word_bins(xlim, ylim, shape, size, es)
+    words = np.asarray(words)
+    return _count(bins[0][words[:, 0]], bins[1][words[:, 1]], shape)
+
+
+class DensityView:
+    """
+    Density image of a growing trajectory on a matplotlib Axes.
+
+    `update(x, y)` is called with the whole trajectory so far (e.g. views of
+    preallocated buffers): only the points past the ones already counted are
+    binned, unless the view changed since, then all of them are.
+    """
+
+    def __init__(self, axes, cmap="Greys", visible=True):
+        self.axes = axes
+        self.counts = None
+        self.view = None
+        self.binned = 0
+        # imshow fits the limits to the image, keep the ones of the trajectory
+        xlim, ylim = axes.get_xlim(), axes.get_ylim()
+        self.image = axes.imshow(
+            np.ma.masked_all((1, 1)),
+            origin="lower",
+            aspect="auto",
+            interpolation="nearest",
+            cmap=cmap,
+            norm=LogNorm(vmin=1, vmax=1, clip=True),
+            visible=visible,
+            zorder=0,
+        )
+        axes.set_xlim(xlim)
+        axes.set_ylim(ylim)
+
+    def _view(self):
+        # one bin per pixel of the axes
+        bbox = self.axes.get_window_extent()
+        shape = (max(int(bbox.height), 1), max(int(bbox.width), 1))
+        return tuple(self.axes.get_xlim()), tuple(self.axes.get_ylim()), shape
+
+    def reset(self):
+        """start a new trajectory"""
+        self.counts = None
+        self.binned = 0
+
+    def update(self, x, y):
+        """
+        Returns:
+        True if the image changed
+        """
+        view = self._view()
+        if view != self.view or self.counts is None or len(x) < self.binned:
+            self.view = view
+            self.counts = np.zeros(view[2], dtype=np.int64)
+            self.binned = 0
+        if len(x) == self.binned and self.image.get_extent() == [*view[0], *view[1]]:
+            return False
+        self.counts += density(x[self.binned :], y[self.binned :], *view)
+        self.binned = len(x)
+        self.image.set_data(np.ma.masked_equal(self.counts, 0))
+        self.image.set_extent((*view[0], *view[1]))
+        self.image.norm.vmax = max(int(self.counts.max()), 1)
+        return True
@@ -0,0 +1,100 @@
+"""
+asyncio interface to the board.
+
+`DdaDevice` owns a backend (backend.py, the board or the simulated chip).
+Every blocking call (and the decoding of what it returns) runs on the
+device's own single-thread executor, which also serializes the accesses to
+the device, so the event loop stays free for analysis, a server, ...:
+
+    async with DdaDevice() as dev:      # DdaDevice("sim") without a board
+        async for chunk in dev.stream(2.0, 100000):
+            ...     # chunk: pipeline.Chunk, decoded numpy arrays
+
+While a chunk is being consumed the next one is already being read.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from posit import from_double
+from burst import frames, decode_frames
+from backend import URL, open_backend
+from pipeline import Chunk
+
+
+class DdaDevice:
+    """
+    Parameters:
+    url: FTDI device or "sim", see `backend.open_backend`
+    freq: SPI clock (Hz)
+    chunk: frames per burst read
+    backend: an opened backend to use instead of `url`
+    """
+
+    def __init__(self, url=URL, freq=1e6, chunk=4096, size=16, es=1, backend=None):
+        self.url = url
+        self.freq = freq
+        self.chunk = chunk
+        self.size = size
+        self.es = es
+        self.backend = backend
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dda-device")
+
+    def _open(self):
+        if self.backend is None:
+            self.backend = open_backend(self.url, self.freq)
+
+    def _close(self):
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def open(self):
+        await self._run(self._open)
+        return self
+
+    async def close(self):
+        await self._run(self._close)
+        self._executor.shutdown()
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _read(self, tx, start, n):
+        buf = self.backend.exchange(tx, n)
+        x, y = decode_frames(buf, self.size, self.es)
+        return Chunk(start, frames(buf).astype(np.uint16), x, y)
+
+    async def stream(self, mu, n):
+        """
+        Async iterator over the `n` next frames with `mu` (a float, encoded in
+        posit like controller.py does) sent in every frame.
+
+        Yields:
+        `pipeline.Chunk` of up to `chunk` frames
+        """
+        tx = from_double(x=mu, size=self.size, es=self.es).bit_repr().to_bytes(4, byteorder="big")
+        loop = asyncio.get_running_loop()
+
+        def submit(start):
+            if start >= n:
+                return None
+            return loop.run_in_executor(self._executor, self._read, tx, start, min(self.chunk, n - start))
+
+        pending = submit(0)
+        try:
+            while pending is not None:
+                chunk = await pending
+                # read ahead while the caller works on this chunk
+                pending = submit(chunk.start + self.chunk)
+                yield chunk
+        finally:
+            if pending is not None:
+                await asyncio.gather(pending, return_exceptions=True)
@@ -7,48 +7,126 @@ from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as Navigatio
 from matplotlib.figure import Figure
 import matplotlib
 
-from pyftdi.spi import SpiController
-from pyftdi.usbtools import UsbToolsError
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
-from posit import from_bits, from_double
+import numpy as np
+
+from posit import from_double, decode_array
+from dda import Top, mu_table, unary_tables, unpack
+from burst import frames, decode_frames
+from pipeline import Chunk
+from density import DensityView
+from bifurcation import bifurcation, plot_diagram
+from backend import URL, BackendError, SimBackend
+from tune import open_tuned
 
 matplotlib.use('QtAgg')
 
+# frames per emitted chunk, the first chunks of a run start at FIRST_CHUNK and double
+CHUNK = 4096
+FIRST_CHUNK = 256
+# slider settle time before a new acquisition (ms)
+DEBOUNCE = 150
+# frames of the model preview shown while the chip data comes in, previews kept
+PREVIEW = 50000
+PREVIEW_CACHE = 32
+# plot refresh period (ms)
+REFRESH = 33
+
 class SpiSignals(QObject):
     new_data = pyqtSignal(object)
 
+class PreviewSignals(QObject):
+    ready = pyqtSignal(float, object, object) # mu, cache key, (x, y)
+
 class SpiWorker(QRunnable):
     '''
     SPI interface thread
+    Holds `lock` (the device) for one burst at a time and stops between
+    bursts once `cancel` is called.
     '''
-    def __init__(self,spi,mu,n):
+    def __init__(self,backend,mu,n,lock,chunk=CHUNK):
         super(SpiWorker,self).__init__()
         self.signals = SpiSignals()
-        self.spi = spi
+        self.backend = backend
         self.mu = mu # Van der Pol parameter
         self.n = n # number of points to calculate
+        self.lock = lock # device access
+        self.chunk = chunk # points per new_data signal
+        self.cancelled = threading.Event()
 
         # Posit (16,1)
         self.N = 16
         self.ES = 1
         
         self.p_mu = from_double(x=self.mu, size=self.N, es=self.ES)
+        self.tx = self.p_mu.bit_repr().to_bytes(4,byteorder='big')
         print(self.mu)
 
+    def cancel(self):
+        self.cancelled.set()
+
     @pyqtSlot()
     def run(self):
-        x = []
-        y = []
-        for _ in range(self.n):
-            read_buf = self.spi.exchange(self.p_mu.bit_repr().to_bytes(4,byteorder='big'), duplex=True)
-            p_x = from_bits(int.from_bytes(read_buf[0:2],byteorder='big'),self.N,self.ES)
-            p_y = from_bits(int.from_bytes(read_buf[2:4],byteorder='big'),self.N,self.ES)
-            x.append(p_x.eval())
-            y.append(p_y.eval())
-            # print(data)
-        print([x,y])
-        self.signals.new_data.emit([x,y])
-            # time.sleep(0.03)
+        # one burst per chunk (see burst.py), handed to the plot as soon as it is read;
+        # small ones first so the first points show up quickly
+        start, size = 0, min(FIRST_CHUNK, self.chunk)
+        while start < self.n:
+            with self.lock:
+                if self.cancelled.is_set():
+                    return
+                read_buf = self.backend.exchange(self.tx, min(size, self.n - start))
+            x, y = decode_frames(read_buf, self.N, self.ES)
+            self.signals.new_data.emit(Chunk(start, frames(read_buf), x, y))
+            start += len(x)
+            size = min(2 * size, self.chunk)
+
+
+class Acquisition(QObject):
+    '''
+    One acquisition at a time on the device: a new one cancels the one
+    running, `request` only starts one when mu stops changing for `delay` ms.
+    '''
+    started = pyqtSignal(float, int) # mu, n of a new run
+    new_data = pyqtSignal(object) # chunks of the current run only
+
+    def __init__(self,backend,delay=DEBOUNCE):
+        super(Acquisition,self).__init__()
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.threadpool = QThreadPool()
+        self.worker = None
+        self.pending = None
+
+        self.debounce = QTimer()
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(delay)
+        self.debounce.timeout.connect(lambda: self.start(*self.pending))
+
+    def request(self,mu,n):
+        self.pending = (mu, n)
+        self.debounce.start()
+
+    def start(self,mu,n):
+        self.debounce.stop()
+        self.cancel()
+        self.worker = SpiWorker(self.backend,mu,n,self.lock)
+        self.worker.signals.new_data.connect(self.forward)
+        self.started.emit(mu, n)
+        self.threadpool.start(self.worker)
+
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.cancel()
+
+    @pyqtSlot(object)
+    def forward(self,chunk):
+        # chunks already queued by a cancelled worker are dropped
+        if self.worker is not None and self.sender() is self.worker.signals:
+            self.new_data.emit(chunk)
 
 
 class MplCanvas(FigureCanvas):
@@ -61,6 +139,88 @@ class MplCanvas(FigureCanvas):
         super(MplCanvas, self).__init__(fig)
 
 
+class BifurcationSignals(QObject):
+    progress = pyqtSignal(str)
+    done = pyqtSignal(object, object) # mu, crossings
+
+class BifurcationWorker(QRunnable):
+    '''
+    Runs bifurcation.py over a mu grid (itself on a process pool)
+    '''
+    def __init__(self,mus,transient=None):
+        super(BifurcationWorker,self).__init__()
+        self.signals = BifurcationSignals()
+        self.mus = mus
+        self.transient = transient
+
+    @pyqtSlot()
+    def run(self):
+        x = bifurcation(self.mus, transient=self.transient, progress=self.signals.progress.emit)
+        self.signals.done.emit(self.mus, x)
+
+
+class BifurcationTab(QWidget):
+    '''
+    Amplitude vs mu diagram of the software model, see bifurcation.py
+    '''
+    def __init__(self, *args, **kwargs):
+        super(BifurcationTab, self).__init__(*args, **kwargs)
+        self.canvas = MplCanvas(self,width=5, height=4, dpi=100)
+        self.canvas.axes.set_xlim([0,5])
+
+        self.start = QDoubleSpinBox()
+        self.start.setPrefix("mu from ")
+        self.start.setRange(0, 10)
+        self.start.setValue(0.1)
+        self.stop = QDoubleSpinBox()
+        self.stop.setPrefix("to ")
+        self.stop.setRange(0, 10)
+        self.stop.setValue(5)
+        self.count = QSpinBox()
+        self.count.setSuffix(" values")
+        self.count.setRange(2, 100000)
+        self.count.setValue(1000)
+        # 0: skip more clocks as mu gets small, see bifurcation.transient_steps
+        self.transient = QSpinBox()
+        self.transient.setPrefix("skip ")
+        self.transient.setSuffix(" clocks")
+        self.transient.setSpecialValueText("skip clocks by mu")
+        self.transient.setRange(0, 1 << 20)
+        self.transient.setSingleStep(1024)
+        self.button = QPushButton("Compute")
+        self.button.pressed.connect(self.compute)
+        self.status = QLabel()
+
+        grid = QHBoxLayout()
+        grid.addWidget(self.start)
+        grid.addWidget(self.stop)
+        grid.addWidget(self.count)
+        grid.addWidget(self.transient)
+        grid.addWidget(self.button)
+
+        layout = QVBoxLayout()
+        layout.addWidget(NavigationToolbar(self.canvas, self))
+        layout.addWidget(self.canvas)
+        layout.addLayout(grid)
+        layout.addWidget(self.status)
+        self.setLayout(layout)
+
+    def compute(self):
+        self.button.setEnabled(False)
+        mus = np.linspace(self.start.value(), self.stop.value(), self.count.value())
+        worker = BifurcationWorker(mus, self.transient.value() or None)
+        worker.signals.progress.connect(self.status.setText)
+        worker.signals.done.connect(self.show_diagram)
+        QThreadPool.globalInstance().start(worker)
+
+    def show_diagram(self,mus,x):
+        self.canvas.axes.cla()
+        plot_diagram(self.canvas.axes, mus, x)
+        self.canvas.axes.set_title("DDA Van Der Pol bifurcation diagram")
+        self.canvas.draw()
+        self.button.setEnabled(True)
+
+
 class MainWindow(QMainWindow):
 
     def __init__(self, *args, **kwargs):
@@ -82,64 +242,208 @@ class MainWindow(QMainWindow):
         s.setSingleStep(1)
         s.valueChanged.connect(self.parameter_changed)
 
+        # density image instead of the line, for runs of millions of points
+        d = QCheckBox("Density")
+        d.toggled.connect(self.density_toggled)
+
         self.muLabel = QLabel()
         layout.addWidget(self.toolbar)
         layout.addWidget(self.canvas)
         layout.addWidget(self.muLabel)
         layout.addWidget(s)
+        layout.addWidget(d)
         layout.addWidget(b)
 
         w = QWidget()
         w.setLayout(layout)
 
-        self.setCentralWidget(w)
+        # phase portrait of the chip, bifurcation diagram of the model
+        tabs = QTabWidget()
+        tabs.addTab(w, "Phase portrait")
+        self.bifurcation = BifurcationTab()
+        tabs.addTab(self.bifurcation, "Bifurcation")
+        self.setCentralWidget(tabs)
 
-        self.xdata = []
-        self.ydata = []
         self.mu = 0.1
         self.n = 10000
+
+        # Points of the run, preallocated; `count` received, `drawn` on the canvas.
+        self.xdata = np.empty(self.n)
+        self.ydata = np.empty(self.n)
+        self.count = 0
+        self.drawn = 0
+
+        # One persistent line, animated: drawn by blitting only the points
+        # added since the last refresh over a snapshot of the canvas.
+        axes = self.canvas.axes
+        axes.set_xlabel("X")
+        axes.set_ylabel("Y")
+        (self.line,) = axes.plot([], [], 'k', animated=True)
+        # model trajectory for the new mu, until the chip data is all in
+        (self.preview_line,) = axes.plot([], [], color='0.7', lw=0.8)
+        self.density = DensityView(axes, visible=False)
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
         # self.xdata = [random.randint(0, 10) for i in range(n_data)]
         # self.ydata = [random.randint(0, 10) for i in range(n_data)]
         # self.update_plot()
 
-        self.spi_ctrl = SpiController()
+        # python gui.py [url]: the board by default, "sim" for the software model
         try:
-            self.spi_ctrl.configure('ftdi://ftdi:232h:1/1')
-            self.spi_ctrl.flush()
-            self.spi = self.spi_ctrl.get_port(cs=0, freq=1E6, mode=0)
-        except UsbToolsError as err :
+            url = sys.argv[1] if len(sys.argv) > 1 else URL
+            # SPI clock found by tune.py for this device, if it was calibrated
+            self.backend = open_tuned(url, 1E6)
+        except BackendError as err :
             print("Error:",err)
-            exit(1)
+            print("Running on the simulated DDA")
+            self.backend = SimBackend()
+
+        self.acquisition = Acquisition(self.backend)
+        self.acquisition.started.connect(self.new_run)
+        self.acquisition.new_data.connect(self.update_plot)
+
+        # Previews are emulated off the UI thread (dda.Top, see dda.py) from the
+        # initial conditions, and kept per mu for slider moves back. The workers
+        # are spawned (not forked from a process running Qt and worker threads)
+        # and build the model tables once, when the window opens.
+        self.emulator = ProcessPoolExecutor(
+            max_workers=2, mp_context=multiprocessing.get_context("spawn"), initializer=unary_tables
+        )
+        self.emulator.submit(mu_table, 0)
+        self.pending_preview = None
+        self.preview_signals = PreviewSignals()
+        self.preview_signals.ready.connect(self.show_preview)
+        self.previews = {}
+        self.run_mu = None
 
         self.show()
-        self.threadpool = QThreadPool()
+
+        self.timer = QTimer()
+        self.timer.setInterval(REFRESH)
+        self.timer.timeout.connect(self.refresh_plot)
+        self.timer.start()
 
     def parameter_changed(self,n):
         self.mu = (float) (n/10)
         self.muLabel.setText(f"mu: {self.mu}")
-    
+        self.preview(self.mu)
+        self.acquisition.request(self.mu, self.n)
+
+    def preview(self,mu):
+        mu_bits = from_double(x=mu, size=16, es=1).bit_repr()
+        n = min(self.n, PREVIEW)
+        key = (mu_bits, n)
+        if key in self.previews:
+            self.show_preview(mu, key, self.previews[key])
+            return
+        if self.pending_preview is not None:
+            # not started yet, mu already moved on
+            self.pending_preview.cancel()
+        future = self.emulator.submit(Top(mu_bits).burst, mu_bits, n)
+        self.pending_preview = future
+
+        def done(future):
+            # in a pool thread: the signal hands the result over to the UI thread
+            if not future.cancelled() and future.exception() is None:
+                x, y = unpack(future.result())
+                self.preview_signals.ready.emit(mu, key, (decode_array(x), decode_array(y)))
+
+        future.add_done_callback(done)
+
+    def show_preview(self,mu,key,xy):
+        self.previews[key] = xy
+        while len(self.previews) > PREVIEW_CACHE:
+            del self.previews[next(iter(self.previews))]
+        # stale previews (mu moved on, or the chip data is already all in) are not shown
+        if mu != self.mu or (mu == self.run_mu and self.count == len(self.xdata)):
+            return
+        self.preview_line.set_data(*xy)
+        self.preview_line.set_visible(True)
+        self.canvas.draw_idle()
+
+    def closeEvent(self,event):
+        self.acquisition.cancel()
+        self.emulator.shutdown(wait=False, cancel_futures=True)
+        super(MainWindow, self).closeEvent(event)
+
+    def density_toggled(self,checked):
+        self.line.set_visible(not checked)
+        self.density.image.set_visible(checked)
+        self.density.reset()
+        self.canvas.draw()
+
     def run(self):
-        worker = SpiWorker(self.spi,self.mu,self.n)
-        worker.signals.new_data.connect(self.update_plot)
-        self.threadpool.start(worker)
-    
-    def update_plot(self,data):
-        # Drop off the first y element, append a new one.
-        # self.ydata = self.ydata[1:] + [data[0]]
-        # self.xdata = self.xdata[1:] + [data[1]]
-        self.xdata = data[0]
-        self.ydata = data[1]
-        self.canvas.axes.cla()  # Clear the canvas.
-        self.canvas.axes.plot(self.xdata, self.ydata, 'k')
-        self.canvas.axes.set_xlabel("X")
-        self.canvas.axes.set_ylabel("Y")
-        self.canvas.axes.set_title(r"DDA Van Der Pol $\mu = {}$".format(self.mu))
-        # self.canvas.axes.set_aspect('equal')
-        # self.canvas.axes.set_xlim([-3,3])
-        # self.canvas.axes.set_ylim([-3,3])
-        # Trigger the canvas to update and redraw.
+        self.preview(self.mu)
+        self.acquisition.start(self.mu, self.n)
+
+    def new_run(self,mu,n):
+        self.run_mu = mu
+        if len(self.xdata) != n:
+            self.xdata = np.empty(n)
+            self.ydata = np.empty(n)
+        self.count = 0
+        self.drawn = 0
+        self.density.reset()
+        self.canvas.axes.set_title(r"DDA Van Der Pol $\mu = {}$".format(mu))
         self.canvas.draw()
-        
-app = QApplication([])
-window = MainWindow()
-app.exec()
\ No newline at end of file
+
+    def update_plot(self,chunk):
+        # Only store the points, the timer draws them.
+        end = chunk.start + len(chunk.x)
+        self.xdata[chunk.start:end] = chunk.x
+        self.ydata[chunk.start:end] = chunk.y
+        self.count = end
+        if self.count == len(self.xdata) and self.preview_line.get_visible():
+            # all the chip data is in, it replaces the preview
+            self.preview_line.set_visible(False)
+            self.canvas.draw_idle()
+
+    def on_draw(self,event):
+        # Full redraws (new run, new limits, zoom, resize) leave the animated
+        # line out: draw all of it and keep the result as the background.
+        self.line.set_data(self.xdata[:self.count], self.ydata[:self.count])
+        self.canvas.axes.draw_artist(self.line)
+        self.background = self.canvas.copy_from_bbox(self.canvas.axes.bbox)
+        self.drawn = self.count
+
+    def grow_limits(self,x,y):
+        # True if the points leave the view: it is grown and everything redrawn once
+        finite = np.isfinite(x) & np.isfinite(y)
+        if not finite.any():
+            return False
+        x, y = x[finite], y[finite]
+        axes = self.canvas.axes
+        (xmin, xmax), (ymin, ymax) = axes.get_xlim(), axes.get_ylim()
+        if x.min() >= xmin and x.max() <= xmax and y.min() >= ymin and y.max() <= ymax:
+            return False
+        axes.set_xlim(min(xmin, 1.1 * x.min()), max(xmax, 1.1 * x.max()))
+        axes.set_ylim(min(ymin, 1.1 * y.min()), max(ymax, 1.1 * y.max()))
+        self.canvas.draw()
+        return True
+
+    def refresh_plot(self):
+        if self.density.image.get_visible():
+            # binned over the view, rebinned when zoomed or resized: the cost follows the pixels
+            new = slice(min(self.density.binned, self.count), self.count)
+            self.grow_limits(self.xdata[new], self.ydata[new])
+            if self.density.update(self.xdata[:self.count], self.ydata[:self.count]):
+                self.canvas.draw_idle()
+            return
+        if self.background is None or self.drawn >= self.count:
+            return
+        x = self.xdata[max(self.drawn - 1, 0):self.count]
+        y = self.ydata[max(self.drawn - 1, 0):self.count]
+        if self.grow_limits(x, y):
+            return
+        # Only the new segment (from the last point drawn) over the snapshot.
+        self.canvas.restore_region(self.background)
+        self.line.set_data(x, y)
+        self.canvas.axes.draw_artist(self.line)
+        self.canvas.blit(self.canvas.axes.bbox)
+        self.background = self.canvas.copy_from_bbox(self.canvas.axes.bbox)
+        self.drawn = self.count
+
+if __name__ == "__main__":
+    app = QApplication([])
+    window = MainWindow()
+    app.exec()
\ No newline at end of file
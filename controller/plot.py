@@ -1,11 +1,36 @@
 import matplotlib.pyplot as plt
 import numpy as np
 import sys 
-xy = np.genfromtxt(sys.argv[1],delimiter=",", dtype=float)
-ax = plt.figure().add_subplot()
+from capture import is_capture, open_capture
+from density import DensityView
 
-ax.plot(*xy.T, lw=1.5)
+# python plot.py file [--density]: --density draws a density image instead of the line,
+# rebinned on every zoom (for captures of millions of frames)
+if is_capture(sys.argv[1]):
+    xy = np.stack(open_capture(sys.argv[1]).decode(), axis=-1)
+else:
+    xy = np.genfromtxt(sys.argv[1],delimiter=",", dtype=float)
+fig = plt.figure()
+ax = fig.add_subplot()
+
+if "--density" in sys.argv[2:]:
+    x, y = xy[:, 0], xy[:, 1]
+    finite = np.isfinite(x) & np.isfinite(y)
+    ax.set_xlim(x[finite].min(), x[finite].max())
+    ax.set_ylim(y[finite].min(), y[finite].max())
+    view = DensityView(ax)
+
+    def rebin(*args):
+        if view.update(x, y):
+            fig.canvas.draw_idle()
+
+    ax.callbacks.connect("xlim_changed", rebin)
+    ax.callbacks.connect("ylim_changed", rebin)
+    fig.canvas.mpl_connect("resize_event", rebin)
+    rebin()
+else:
+    ax.plot(*xy.T, lw=1.5)
 ax.set_xlabel("X")
 ax.set_ylabel("Y")
 ax.set_title("DDA Van Der Pol Oscillator")
-plt.show()
\ No newline at end of file
+plt.show()
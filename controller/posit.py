@@ -8,6 +8,8 @@ import struct
 from math import inf, log2
 import re
 
+import numpy as np
+
 msb = lambda N: shl(1, N - 1, N)  # if N = 8bits: 1 << 8 i.e. 1000_0000
 mask = lambda N: 2 ** N - 1  # N-bit ALL ones
 
@@ -773,6 +775,246 @@ def from_posit(p: Posit, size, es) -> Posit:
     pass
 
 
+def _bits_dtype(size):
+    """smallest unsigned numpy dtype holding a P<size,*> bit pattern"""
+    if size > 32:
+        raise ValueError("array routines support posits up to 32 bits.")
+    return np.uint16 if size <= 16 else np.uint32
+
+
+def _bit_length(x):
+    """bit length of each element of a uint64 array (exact for x < 2 ** 53)"""
+    return np.frexp(x.astype(np.float64))[1].astype(np.int64)
+
+
+def _decode_fields(bits, size, es):
+    """
+    Vectorized counterpart of `from_bits()`.
+
+    Returns (sign, is_special, k, exp, frac) arrays, where `frac` holds the
+    mantissa left aligned on `size - es` bits (i.e. 1.mant = 1 + frac / 2 ** (size - es)).
+    """
+    bits = np.asarray(bits).astype(np.uint64) & np.uint64(mask(size))
+    sign = bits >> np.uint64(size - 1)
+    is_special = ((bits << np.uint64(1)) & np.uint64(mask(size))) == 0
+
+    u_bits = np.where(sign == 1, (np.uint64(mask(size)) - bits + np.uint64(1)) & np.uint64(mask(size)), bits)
+    reg_s = (u_bits >> np.uint64(size - 2)) & np.uint64(1)
+
+    # leading regime run: count leading zeros of the (regime-sign normalized) bits after the sign
+    run = (u_bits << np.uint64(1)) & np.uint64(mask(size))
+    run = np.where(reg_s == 1, ~run & np.uint64(mask(size)), run)
+    m = size - _bit_length(run)
+
+    k = np.where(reg_s == 1, m - 1, -m)
+    reg_len = m + 1
+
+    # remaining bits after sign and regime, left aligned on `size` bits
+    rest = (u_bits << (reg_len + 1).astype(np.uint64)) & np.uint64(mask(size))
+    exp = rest >> np.uint64(size - es)
+    frac = rest & np.uint64(mask(size - es))
+
+    return sign, is_special, k, exp, frac
+
+
+def _pack_bits(sign, k, exp, mant, size, es):
+    """
+    Vectorized counterpart of `Posit.bit_repr()` for non special posits.
+
+    `k` must already be clamped to the regime range; fields are or-ed
+    together exactly like `bit_repr()` does.
+    """
+    reg_len = np.where(k >= 0, k + 2, 1 - k)
+    regime_shift = size - 1 - reg_len
+    regime_bits = np.where(k >= 0, ((np.int64(1) << (k + 1)) - 1) << 1, 1)
+    regime_field = np.where(
+        regime_shift > 0, (regime_bits << np.maximum(regime_shift, 0)) & mask(size), regime_bits >> np.maximum(-regime_shift, 0)
+    )
+    exp_shift = regime_shift - es
+    exp_field = np.where(exp_shift > 0, (exp << np.maximum(exp_shift, 0)) & mask(size), exp >> np.maximum(-exp_shift, 0))
+
+    bits = regime_field.astype(np.uint64) | exp_field.astype(np.uint64) | mant.astype(np.uint64)
+    return np.where(sign == 0, bits, (~bits + np.uint64(1)) & np.uint64(mask(size)))
+
+
+def _decode_array(bits, size, es):
+    sign, is_special, k, exp, frac = _decode_fields(bits, size, es)
+    scale = (k << es) + exp.astype(np.int64)
+    value = np.ldexp(1.0 + frac / float(1 << (size - es)), scale)
+    value = np.where(sign == 1, -value, value)
+    return np.where(is_special, np.where(sign == 1, inf, 0.0), value)
+
+
+_decode_tables = {}
+
+
+def decode_table(size=16, es=1):
+    """
+    Real value of every P<size,es> bit pattern, indexed by the pattern itself.
+
+    Built on first use and cached. Only for posits up to 16 bits (65536 entries).
+    """
+    if size > 16:
+        raise ValueError("decode tables are only built for posits up to 16 bits.")
+    key = (size, es)
+    if key not in _decode_tables:
+        table = _decode_array(np.arange(1 << size, dtype=np.uint32), size, es)
+        table.flags.writeable = False
+        _decode_tables[key] = table
+    return _decode_tables[key]
+
+
+def decode_array(bits, size=16, es=1):
+    """
+    Posit decoder for whole arrays.
+
+    Same values as `from_bits(b, size, es).eval()` for every `b` in `bits`
+    (NaR decodes to inf), computed with a single table gather when size <= 16.
+
+    Parameters:
+    bits (array of unsigned): posit bit patterns
+    size (unsigned): length of posit
+    es (unsigned): exponent field size.
+
+    Returns:
+    float64 numpy array with the shape of `bits`
+    """
+    if es > size - 1:
+        raise ValueError("`es` field can't be larger than the full posit itself.")
+    if size <= 16:
+        bits = np.asarray(bits)
+        # unsigned words no wider than the posit index the table as they are
+        # (big-endian views included), without a masked copy
+        if bits.dtype.kind != "u" or bits.dtype.itemsize * 8 > size:
+            bits = bits & mask(size)
+        return decode_table(size, es)[bits]
+    return _decode_array(bits, size, es)
+
+
+def encode_array(x, size=16, es=1):
+    """
+    Posit encoder for whole arrays.
+
+    Bit-identical to `from_double(v, size, es).bit_repr()` for every `v` in `x`,
+    including its sign dependent rounding of ties and the way a rounded up
+    mantissa is or-ed (not carried) into the exponent field.
+
+    Parameters:
+    x (array of float): real numbers
+    size (unsigned): length of posit
+    es (unsigned): exponent field size.
+
+    Returns:
+    uint16 (size <= 16) or uint32 numpy array with the shape of `x`
+    """
+    if es > size - 1:
+        raise ValueError("`es` field can't be larger than the full posit itself.")
+    dtype = _bits_dtype(size)
+
+    x = np.asarray(x, dtype=np.float64)
+    f64_bits = x.view(np.uint64)
+
+    p_sign = f64_bits >> np.uint64(F64.SIZE - 1)
+    f64exp_wo_bias = ((f64_bits >> np.uint64(F64.MANT_SIZE)) & np.uint64(mask(F64.ES))).astype(np.int64) - F64.EXP_BIAS
+    f64_mant = f64_bits & np.uint64(mask(F64.MANT_SIZE))
+
+    k = f64exp_wo_bias >> es
+    p_exp = f64exp_wo_bias - (k << es)
+
+    # Regime(size, k) clamps k but leaves p_exp untouched
+    k = np.clip(k, -(size - 2), size - 2)
+    reg_len = np.where(k >= 0, k + 2, 1 - k)
+    mant_len = size - 1 - es - reg_len
+
+    # past 52 bits nothing is kept and nothing can round up, so the shift is capped
+    mant_len_diff = np.minimum(F64.MANT_SIZE - mant_len, 63).astype(np.uint64)
+    p_mant = f64_mant >> mant_len_diff
+    mant_discarded = f64_mant & ((np.uint64(1) << mant_len_diff) - np.uint64(1))
+    threshold = np.uint64(1) << (mant_len_diff - np.uint64(1))
+    round_up = np.where(p_sign == 0, mant_discarded > threshold, mant_discarded >= threshold)
+    p_mant = p_mant + round_up.astype(np.uint64)
+
+    bits = _pack_bits(p_sign, k, p_exp, p_mant, size, es)
+    bits = np.where(x == 0, np.uint64(0), bits)
+    bits = np.where(x == inf, np.uint64(msb(size)), bits)
+    return bits.astype(dtype)
+
+
+def mul_array(bits1, bits2, size=16, es=1):
+    """
+    Posit multiplication on whole arrays of bit patterns.
+
+    Bit-identical to `mul(from_bits(a), from_bits(b)).bit_repr()` element-wise,
+    including 0 / NaR handling, regime clamping (no rounding once k is out of
+    range) and the sign dependent rounding of ties. `bits1` and `bits2` are
+    broadcast against each other.
+
+    Parameters:
+    bits1, bits2 (arrays of unsigned): posit bit patterns
+    size (unsigned): length of posit
+    es (unsigned): exponent field size.
+
+    Returns:
+    uint16 (size <= 16) or uint32 numpy array
+    """
+    if es > size - 1:
+        raise ValueError("`es` field can't be larger than the full posit itself.")
+    dtype = _bits_dtype(size)
+    bits1, bits2 = np.broadcast_arrays(np.asarray(bits1), np.asarray(bits2))
+
+    s1, special1, k1, e1, frac1 = _decode_fields(bits1, size, es)
+    s2, special2, k2, e2, frac2 = _decode_fields(bits2, size, es)
+
+    sign = s1 ^ s2
+    k = k1 + k2
+    exp = (e1 + e2).astype(np.int64)
+
+    # 1.mant left aligned on `size` bits, fixed point product on 2 * size bits
+    f1 = np.uint64(msb(size)) | ((frac1 << np.uint64(es)) >> np.uint64(1))
+    f2 = np.uint64(msb(size)) | ((frac2 << np.uint64(es)) >> np.uint64(1))
+    mant = f1 * f2
+
+    mant_carry = ((mant >> np.uint64(2 * size - 1)) & np.uint64(1)).astype(np.int64)
+
+    exp_carry = (exp >> es) & 1
+    k = k + exp_carry
+    exp = np.where(exp_carry == 1, exp & mask(es), exp)
+
+    exp = exp + mant_carry
+    exp_carry = mant_carry & (exp >> es) & 1
+    k = k + exp_carry
+    exp = np.where(exp_carry == 1, exp & mask(es), exp)
+    mant = np.where(mant_carry == 1, mant >> np.uint64(1), mant)
+
+    k_is_oob = (k > size - 2) | (k < -(size - 2))
+    k = np.clip(k, -(size - 2), size - 2)
+    reg_len = np.where(k >= 0, k + 2, 1 - k)
+
+    mant_fractional_part = mant & np.uint64(mask(2 * size - 2))
+    mant_len = size - 1 - es - reg_len
+
+    # past 2 * size - 2 bits nothing is kept and nothing can round up, so the shift is capped
+    len_discarded = np.minimum(2 * size - 2 - mant_len, 2 * size - 1).astype(np.uint64)
+    mant_discarded = mant_fractional_part & ((np.uint64(1) << len_discarded) - np.uint64(1))
+    mant_left = mant_fractional_part >> len_discarded
+    threshold = np.uint64(1) << (len_discarded - np.uint64(1))
+
+    round_up = ~k_is_oob & np.where(sign == 0, mant_discarded > threshold, mant_discarded >= threshold)
+    mant_full = round_up & (mant_left == (np.uint64(1) << np.maximum(mant_len, 0).astype(np.uint64)) - np.uint64(1))
+    mant_left = np.where(round_up & ~mant_full, mant_left + np.uint64(1), np.where(mant_full, np.uint64(0), mant_left))
+    exp_full = mant_full & (exp == mask(es))
+    exp = np.where(mant_full & ~exp_full, exp + 1, np.where(exp_full, 0, exp))
+    k = np.where(exp_full & (k < size - 2), k + 1, k)
+
+    bits = _pack_bits(sign, k, exp, mant_left, size, es)
+
+    is_nar = (special1 & (s1 == 1)) | (special2 & (s2 == 1))
+    is_zero = (special1 & (s1 == 0)) | (special2 & (s2 == 0))
+    bits = np.where(is_zero, np.uint64(0), bits)
+    bits = np.where(is_nar, np.uint64(msb(size)), bits)
+    return bits.astype(dtype)
+
+
 def posit8(*args, **kwargs):
     """This gives me a [Softposit](https://gitlab.com/cerlane/SoftPosit-Python)'s like api.
     from posit_playground import posit8
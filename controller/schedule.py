@@ -0,0 +1,102 @@
+"""
+mu schedules: a different mu in every frame of one continuous acquisition.
+
+top.v loads r_mu from every word it receives, so sending a schedule (a ramp,
+steps, any array) sweeps mu in a single run, with no restart and no setup
+between the sweep points. Frame i reads the state reached with the mu sent
+in frame i - 2 (mu takes effect one frame late and the DDA only steps on
+every other frame), see `frame_mu`.
+
+Usage:
+    python schedule.py capture.dda --ramp 0 5 --n 200000 [--url sim]
+    python schedule.py capture.dda --steps 0.5 1 2 4 --frames 50000
+
+writes the frames to capture.dda and the words sent to capture.dda.mu.npy.
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from posit import encode_array
+from backend import URL
+from capture import CaptureWriter
+from pipeline import Pipeline, RateLimitedPrinter
+from tune import open_tuned
+from verify import Verifier
+
+
+def ramp(start, stop, n):
+    """`n` mu values from `start` to `stop`"""
+    return np.linspace(start, stop, n)
+
+
+def steps(values, frames):
+    """each mu of `values` held for `frames` frames"""
+    return np.repeat(np.asarray(values, dtype=float), frames)
+
+
+def schedule_words(mus, size=16, es=1):
+    """mu values to the 32-bit words sent, all encoded at once (mu in the 16 LSB)"""
+    return encode_array(np.asarray(mus, dtype=float), size, es).astype(np.uint32)
+
+
+def frame_mu(words):
+    """mu word behind the state read in each frame (the first two depend on what was sent before)"""
+    mu = np.full(len(words), -1, dtype=np.int32)
+    mu[2:] = np.asarray(words[:-2]) & 0xFFFF
+    return mu
+
+
+class ScheduleReader:
+    """`read(n)` for `pipeline.Pipeline`, sending the next `n` words of the schedule"""
+
+    def __init__(self, backend, words):
+        self.backend = backend
+        self.words = np.asarray(words, dtype=np.uint32)
+        self.sent = 0
+
+    def __call__(self, n):
+        buf = self.backend.exchange_words(self.words[self.sent : self.sent + n])
+        self.sent += n
+        return buf
+
+
+def acquire(backend, words, sink, chunk=4096):
+    """stream the whole schedule `words` through `sink` (see pipeline.py)"""
+    return Pipeline(ScheduleReader(backend, words), len(words), chunk=chunk).run(sink)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Acquire with a mu schedule")
+    parser.add_argument("path", help="capture file")
+    parser.add_argument("--ramp", type=float, nargs=2, metavar=("START", "STOP"))
+    parser.add_argument("--n", type=int, default=100000, help="frames of the ramp")
+    parser.add_argument("--steps", type=float, nargs="+", metavar="MU")
+    parser.add_argument("--frames", type=int, default=10000, help="frames per step")
+    parser.add_argument("--url", default=URL, help='device url, "sim" for the simulated board')
+    args = parser.parse_args()
+
+    if args.ramp:
+        mus = ramp(*args.ramp, args.n)
+    elif args.steps:
+        mus = steps(args.steps, args.frames)
+    else:
+        sys.exit("--ramp or --steps is needed")
+
+    words = schedule_words(mus)
+    np.save(args.path + ".mu.npy", (words & 0xFFFF).astype(np.uint16))
+    with open_tuned(args.url, 1e6) as backend:
+        write = CaptureWriter(args.path, int(words[0]), spi_clock=backend.frequency)
+        verify = Verifier(words)
+        show = RateLimitedPrinter()
+
+        def sink(chunk):
+            write(chunk)
+            verify(chunk)
+            show(chunk)
+
+        acquire(backend, words, sink)
+        write.close()
+    check = verify.check()
+    print(f"verified {check.frames} frames: {check.errors} wrong ({check.bit_errors} bits), first at frame {check.first}")
@@ -0,0 +1,121 @@
+"""
+SPI clock calibration.
+
+Steps the SPI clock up through FREQUENCIES and, at each step, checks bursts
+read from the chip bit for bit against the model (verify.py). The highest
+clock with no error at all is saved in CLOCKS_FILE under the serial number
+of the board (`Backend.serial`), whatever url it was opened with, and
+controller.py, gui.py and schedule.py open it at that clock (`open_tuned`).
+
+Usage:
+    python tune.py [url ...]
+
+without url every FT232H found is calibrated ("sim" for the simulated board).
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from posit import from_double
+from backend import discover, open_backend
+from burst import frames
+from verify import check_frames
+
+# FT232H SPI clocks, up to its 30 MHz maximum
+FREQUENCIES = [1e5, 2e5, 5e5, 1e6, 2e6, 3e6, 5e6, 7.5e6, 1e7, 1.5e7, 2e7, 3e7]
+
+CLOCKS_FILE = os.path.expanduser("~/.dda_spi_clock.json")
+
+# posit (16,1) NaR
+NAR = 0x8000
+
+
+def load_clocks(path=CLOCKS_FILE):
+    """{serial: SPI clock} saved by `tune`"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_clock(serial, freq, path=CLOCKS_FILE):
+    clocks = load_clocks(path)
+    clocks[serial] = freq
+    with open(path, "w") as f:
+        json.dump(clocks, f, indent=2, sort_keys=True)
+
+
+def saved_frequency(serial, default, path=CLOCKS_FILE):
+    """calibrated SPI clock of the board `serial`, or `default` if it was never calibrated"""
+    return load_clocks(path).get(serial, default)
+
+
+def open_tuned(url, default=1e6, path=CLOCKS_FILE):
+    """`open_backend(url)` at the calibrated clock of the board found there, `default` if there is none"""
+    backend = open_backend(url, default)
+    backend.set_frequency(saved_frequency(backend.serial, default, path))
+    return backend
+
+
+def stuck(words):
+    """
+    True for a burst that tells nothing about the link: constant (the
+    model can settle on a fixed point), or holding NaR, which every mu maps
+    to itself (mu = 0 and mu = 1 both end there); such a chip needs a reset.
+    """
+    words = np.asarray(words)
+    return bool((words == NAR).any() or (words == words[0]).all())
+
+
+def link_ok(backend, mu=2.0, n=20000, trials=3):
+    """True if `trials` bursts of `n` frames at the current clock all match the model, and are not `stuck`"""
+    mu_bits = from_double(x=mu, size=16, es=1).bit_repr()
+    tx = mu_bits.to_bytes(4, byteorder="big")
+    # load mu in r_mu first, check_frames expects it there
+    backend.exchange(tx, 2)
+    for _ in range(trials):
+        words = frames(backend.exchange(tx, n))
+        if stuck(words) or check_frames(mu_bits, words).errors:
+            return False
+    return True
+
+
+def tune(backend, frequencies=FREQUENCIES, mu=2.0, n=20000, trials=3, progress=print):
+    """
+    Returns:
+    the highest of `frequencies` (in increasing order) below which every
+    clock read back without error, None if even the first one failed.
+    The backend is left at that clock.
+    """
+    best = None
+    for freq in frequencies:
+        backend.set_frequency(freq)
+        ok = link_ok(backend, mu, n, trials)
+        if progress is not None:
+            progress(f"{freq / 1e6:g} MHz: {'ok' if ok else 'errors'}")
+        if not ok:
+            break
+        best = freq
+    if best is not None:
+        backend.set_frequency(best)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the highest error free SPI clock of each board")
+    parser.add_argument("url", nargs="*", help="device url, default: all found")
+    parser.add_argument("--n", type=int, default=20000, help="frames per check")
+    parser.add_argument("--trials", type=int, default=3, help="checks per clock")
+    args = parser.parse_args()
+
+    for url in args.url or discover():
+        with open_backend(url, FREQUENCIES[0]) as backend:
+            freq = tune(backend, n=args.n, trials=args.trials)
+        if freq is None:
+            print(f"{url}: no clock works (a chip stuck on NaR needs a reset)")
+        else:
+            save_clock(backend.serial, freq)
+            print(f"{url}: {freq / 1e6:g} MHz saved to {CLOCKS_FILE} for {backend.serial}")
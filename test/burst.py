@@ -0,0 +1,219 @@
+"""
+Burst SPI acquisition.
+
+top.v clocks the DDA on CS falling edges, so every DDA step needs its own
+CS-low / 32 clocks / CS-high frame. Going through `SpiPort.exchange()` costs
+one USB round trip per frame. `BurstSpi` writes the MPSSE commands of
+thousands of frames in one transfer and reads all their responses at once.
+
+The MPSSE sequence of one frame is the one pyftdi uses for an exchange
+(/CS prolog, read-write bytes, /CS epilog and idle), built once for the TX
+word and repeated. The /CS high time between two frames is set by the
+port's cs_hold (`spi.set_mode(0, cs_hold=...)`): it has to last a few
+periods of the chip clock for top.v to see the edges.
+
+`FakeFtdi` runs the commands against the `dda.Top` model instead of a chip.
+"""
+import threading
+from struct import pack as spack
+
+import numpy as np
+
+from posit import decode_array
+from dda import Top
+
+# MPSSE opcodes (pyftdi.ftdi.Ftdi)
+SET_BITS_LOW = 0x80
+RW_BYTES_PVE_NVE_MSB = 0x31
+RW_BYTES_NVE_PVE_MSB = 0x34
+SEND_IMMEDIATE = 0x87
+
+# pyftdi.spi.SpiController.PAYLOAD_MAX_LENGTH
+PAYLOAD_MAX_LENGTH = 0xFF00
+
+# pyftdi.spi.SpiController.CS_BIT, /CS of port 0
+CS_BIT = 0x08
+
+
+def frame_commands(tx, cs_prolog, cs_epilog, direction, cpol=False):
+    """
+    MPSSE commands of one SPI frame.
+
+    Parameters:
+    tx: bytes sent (full duplex, as many read back)
+    cs_prolog, cs_epilog: low GPIO values driven before and after the exchange
+    direction: low GPIO direction
+    cpol: clock polarity (CPHA is not supported)
+
+    Returns:
+    bytes
+    """
+    cmd = bytearray()
+    for ctrl in cs_prolog:
+        cmd.extend((SET_BITS_LOW, ctrl, direction))
+    cmd.extend(spack("<BH", RW_BYTES_NVE_PVE_MSB if cpol else RW_BYTES_PVE_NVE_MSB, len(tx) - 1))
+    cmd.extend(tx)
+    for ctrl in cs_epilog:
+        cmd.extend((SET_BITS_LOW, ctrl, direction))
+    return bytes(cmd)
+
+
+class BurstSpi:
+    """
+    Sends the same `tx` word in `n` back-to-back SPI frames per call.
+
+    Use `from_port` for a pyftdi SpiPort. `ftdi` only needs pyftdi's
+    `write_data` and `read_data_bytes`, `FakeFtdi` provides both.
+    """
+
+    def __init__(self, ftdi, frame, frame_size, lock=None, prepare=None, tx_offset=None):
+        self.ftdi = ftdi
+        self.frame = frame
+        self.frame_size = frame_size
+        # where the tx bytes are in frame, for `exchange_words`
+        self.tx_offset = tx_offset
+        self.frames_max = PAYLOAD_MAX_LENGTH // frame_size
+        self._lock = lock if lock is not None else threading.Lock()
+        self._prepare = prepare
+
+    @classmethod
+    def from_port(cls, spi, tx):
+        """burst of `tx` frames on a pyftdi SpiPort (mode 0 or 2)"""
+        # The frame is built from the same (private) settings pyftdi's
+        # SpiController._exchange_full_duplex uses.
+        ctrl = spi._controller
+        if spi._cpha:
+            raise ValueError("Burst mode does not support CPHA = 1.")
+        gpio = [(c & ctrl._spi_mask) | ctrl._gpio_low for c in spi._cs_prolog]
+        epilog = [(c & ctrl._spi_mask) | ctrl._gpio_low for c in spi._cs_epilog]
+        epilog.append(ctrl._cs_bits | ctrl._gpio_low)
+        frame = frame_commands(tx, gpio, epilog, ctrl.direction & 0xFF, spi._cpol)
+
+        def prepare():
+            if ctrl._frequency != spi._frequency:
+                ctrl._ftdi.set_frequency(spi._frequency)
+                ctrl._frequency = spi._frequency
+
+        return cls(ctrl.ftdi, frame, len(tx), ctrl._lock, prepare, tx_offset=3 * len(gpio) + 3)
+
+    def exchange(self, n):
+        """
+        Run `n` frames.
+
+        Returns:
+        bytearray read back, `frame_size` per frame
+        """
+        out = bytearray()
+        with self._lock:
+            if self._prepare is not None:
+                self._prepare()
+            for start in range(0, n, self.frames_max):
+                frames = min(self.frames_max, n - start)
+                self.ftdi.write_data(self.frame * frames + bytes((SEND_IMMEDIATE,)))
+                out.extend(self._read(frames * self.frame_size))
+        return out
+
+    def exchange_words(self, words):
+        """
+        One frame per 32-bit word of `words`, each sending its own word
+        (frame_size 4 and tx_offset needed). The frames are built in bulk
+        from the frame of `from_port` with numpy.
+
+        Returns:
+        bytearray read back, 4 bytes per frame
+        """
+        words = np.asarray(words, dtype=">u4")
+        template = np.frombuffer(self.frame, dtype=np.uint8)
+        o = self.tx_offset
+        out = bytearray()
+        with self._lock:
+            if self._prepare is not None:
+                self._prepare()
+            for start in range(0, len(words), self.frames_max):
+                chunk = words[start : start + self.frames_max]
+                buf = np.tile(template, (len(chunk), 1))
+                buf[:, o : o + 4] = chunk.view(np.uint8).reshape(-1, 4)
+                self.ftdi.write_data(buf.tobytes() + bytes((SEND_IMMEDIATE,)))
+                out.extend(self._read(len(chunk) * 4))
+        return out
+
+    def _read(self, size):
+        # read_data_bytes gives up after its attempts with what it got
+        data = self.ftdi.read_data_bytes(size, 4)
+        if len(data) != size:
+            raise IOError(f"short read: {len(data)} of {size} bytes")
+        return data
+
+
+def frames(buf):
+    """(n, 2) big-endian uint16 view of the x, y words of a burst response, no copy"""
+    return np.frombuffer(buf, dtype=">u2").reshape(-1, 2)
+
+
+def decode_frames(buf, size=16, es=1):
+    """
+    x, y values of a burst response (bytes or any buffer), straight from the
+    strided columns of the `frames` view through the decode table.
+
+    Returns:
+    (x, y) float64 arrays
+    """
+    words = frames(buf)
+    return decode_array(words[:, 0], size, es), decode_array(words[:, 1], size, es)
+
+
+class FakeFtdi:
+    """
+    Stand-in for pyftdi's Ftdi, running the MPSSE commands written by
+    `BurstSpi` against a `dda.Top` with its CS on `cs`.
+    """
+
+    def __init__(self, top=None, cs=0):
+        self.top = top if top is not None else Top()
+        self.cs_bit = CS_BIT << cs
+        self._cs_low = False
+        self._miso = b""
+        self._mosi = bytearray()
+        self._rx = bytearray()
+
+    def _set_bits_low(self, value):
+        cs_low = not value & self.cs_bit
+        if cs_low and not self._cs_low:
+            self._miso = self.top.select().to_bytes(4, byteorder="big")
+            self._mosi = bytearray()
+        elif self._cs_low and not cs_low:
+            if len(self._mosi) != 4:
+                raise ValueError(f"top.v frames are 32 bits, got {len(self._mosi) * 8}")
+            self.top.receive(int.from_bytes(self._mosi, byteorder="big"))
+        self._cs_low = cs_low
+
+    def _exchange(self, data):
+        if not self._cs_low:
+            self._rx.extend(bytes(len(data)))
+            return
+        start = len(self._mosi)
+        self._mosi.extend(data)
+        # what top.v shifts out past 32 bits is not modeled
+        self._rx.extend(self._miso[start : start + len(data)].ljust(len(data), b"\0"))
+
+    def write_data(self, data):
+        data = bytes(data)
+        i = 0
+        while i < len(data):
+            op = data[i]
+            if op == SET_BITS_LOW:
+                self._set_bits_low(data[i + 1])
+                i += 3
+            elif op in (RW_BYTES_PVE_NVE_MSB, RW_BYTES_NVE_PVE_MSB):
+                length = int.from_bytes(data[i + 1 : i + 3], byteorder="little") + 1
+                self._exchange(data[i + 3 : i + 3 + length])
+                i += 3 + length
+            elif op == SEND_IMMEDIATE:
+                i += 1
+            else:
+                raise NotImplementedError(f"MPSSE command 0x{op:02x}")
+        return len(data)
+
+    def read_data_bytes(self, size, attempt=1):
+        data, self._rx = self._rx[:size], self._rx[size:]
+        return data
@@ -0,0 +1,431 @@
+"""
+Software model of the van der Pol DDA in `src/dda.v`.
+
+The state is the pair of posit (16,1) words (x, y) held by the two
+`euler_integrator`s. One call to `step` is one clock of the `dda` module:
+
+    w_mult1 = x * x                     (mult1)
+    w_sub1  = 1 - w_mult1               (sub_1_mult_x_x)
+    w_mult2 = mu * w_sub1               (mult2)
+    w_mult3 = w_mult2 * y               (mult3)
+    w_sub2  = w_mult3 - x               (sub_rho_z)
+    x      <- dt * y + x                (int1)
+    y      <- dt * w_sub2 + y           (int2)
+
+with every operator taken from `posit_rtl`, so the words are the ones the chip
+computes. `spi_frames` adds the framing of `src/top.v` on top of it.
+
+`run` and `DdaLanes` do not evaluate this dataflow literally: everything that
+only depends on x (and mu, constant for a run) is looked up in 65536-entry
+tables, see `unary_tables` and `mu_table`, leaving mult3 and the three adds
+to compute on every clock.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from posit import mask
+from posit_rtl import N, ES, scalar_ops, posit_add_array, posit_mult_array, posit_dt_mult_array
+
+# 1.0, first operand of sub_1_mult_x_x
+ONE = 0x4000
+
+# 0.5, the initial condition loaded in icx and icy by src/top.v on reset
+IC = 0x3000
+
+
+def neg(w):
+    """
+    Negation as wired in dda.v: {~w[N-1], ~w[N-2:0] + 1'b1}.
+
+    The carry out of the low bits is dropped, so unlike a two's complement
+    0 maps to NaR and NaR to 0. Works on ints and on numpy uint16 arrays.
+    """
+    return (~w & (1 << (N - 1))) | ((~w + 1) & mask(N - 1))
+
+
+def step(mu, x, y):
+    """One clock of the dda module on posit words (ints). Returns the new (x, y)."""
+    add, mult, dt_mult = scalar_ops(N, ES)
+    w_sub1 = add(ONE, neg(mult(x, x)))
+    w_sub2 = add(mult(mult(mu, w_sub1), y), neg(x))
+    return add(dt_mult(y), x), add(dt_mult(w_sub2), y)
+
+
+def step_array(mu, x, y):
+    """`step` on numpy uint16 arrays of words, broadcast together."""
+    w_sub1 = posit_add_array(ONE, neg(posit_mult_array(x, x)))
+    w_sub2 = posit_add_array(posit_mult_array(posit_mult_array(mu, w_sub1), y), neg(np.asarray(x, dtype=np.uint16)))
+    return posit_add_array(posit_dt_mult_array(y), x), posit_add_array(posit_dt_mult_array(w_sub2), y)
+
+
+@lru_cache(maxsize=None)
+def unary_tables():
+    """
+    mu independent single input parts of the datapath, for every word v:
+
+    sub1[v] = 1 - v * v     (mult1 then sub_1_mult_x_x)
+    dt[v]   = dt * v        (posit_dt_mult of both integrators)
+
+    Returns:
+    (sub1, dt) read-only uint16 arrays of 2 ** N entries
+    """
+    w = np.arange(1 << N, dtype=np.uint16)
+    sub1 = posit_add_array(ONE, neg(posit_mult_array(w, w)))
+    dt = posit_dt_mult_array(w)
+    for table in (sub1, dt):
+        table.flags.writeable = False
+    return sub1, dt
+
+
+@lru_cache(maxsize=64)
+def mu_table(mu):
+    """
+    w_mult2 = mu * (1 - x * x) for every x word, for a given `mu` word.
+
+    Built on first use and cached (the 64 most recently used mu).
+
+    Returns:
+    read-only uint16 array of 2 ** N entries
+    """
+    table = posit_mult_array(mu, unary_tables()[0])
+    table.flags.writeable = False
+    return table
+
+
+def run(mu, n, icx=IC, icy=IC):
+    """
+    Trajectory of the dda module for a constant `mu` word.
+
+    Returns:
+    (n, 2) uint16 array of (x, y) words, row 0 being the initial condition
+    loaded on reset and row i the state after i clocks.
+    """
+    add, mult, _ = scalar_ops(N, ES)
+    mult2 = mu_table(int(mu)).tolist()
+    dt = unary_tables()[1].tolist()
+    xy = np.empty((n, 2), dtype=np.uint16)
+    x, y = int(icx), int(icy)
+    for i in range(n):
+        xy[i] = x, y
+        w_sub2 = add(mult(mult2[x], y), neg(x))
+        x, y = add(dt[y], x), add(dt[w_sub2], y)
+    return xy
+
+
+def spi_frames(mu, n, icx=IC, icy=IC):
+    """
+    (x, y) words read back by the first `n` SPI frames after reset, with `mu`
+    sent in every frame (as controller.py does).
+
+    top.v latches {x, y} and toggles clk_dda on each CS falling edge, so the
+    DDA only advances on every other frame: the read back sequence is
+    ic, s1, s1, s2, s2, ...
+
+    Returns:
+    (n, 2) uint16 array
+    """
+    states = run(mu, n // 2 + 1, icx, icy)
+    return states[(np.arange(n) + 1) // 2]
+
+
+class Top:
+    """
+    SPI side of `src/top.v` around the dda module, one 32-bit frame at a time.
+
+    On the CS falling edge top.v loads {x, y} in data_sent and toggles
+    clk_dda, so the DDA steps on every other frame, with the mu held in r_mu.
+    r_mu is only loaded from the 16 LSB of the word received once its 32nd
+    bit is in: mu sent in a frame is used from the next frame on. r_mu has
+    no reset, `mu` is the value it is assumed to hold at power up.
+    """
+
+    def __init__(self, mu=0, icx=IC, icy=IC):
+        self.r_mu = mu
+        self.icx = icx
+        self.icy = icy
+        self.reset()
+
+    def reset(self):
+        """rst_n: load the initial conditions and clear clk_dda"""
+        self.x, self.y = self.icx, self.icy
+        self.clk_dda = 0
+
+    def select(self):
+        """CS falling edge. Returns data_sent, the 32-bit word shifted out during the frame."""
+        data_sent = pack(self.x, self.y)
+        self.clk_dda ^= 1
+        if self.clk_dda:
+            self.x, self.y = step(self.r_mu, self.x, self.y)
+        return data_sent
+
+    def receive(self, word):
+        """32nd SCK rising edge of a frame with `word` on MOSI"""
+        self.r_mu = word & mask(N)
+
+    def exchange(self, word):
+        """one whole frame: sends `word`, returns the word read back"""
+        data_sent = self.select()
+        self.receive(word)
+        return data_sent
+
+    def burst(self, word, n):
+        """
+        `n` frames all sending `word`, as fast as `run()`: after the first
+        frame mu is `word` for the rest of the burst.
+
+        Returns:
+        uint32 array of the `n` words read back
+        """
+        out = np.empty(n, dtype=np.uint32)
+        if n == 0:
+            return out
+        out[0] = self.exchange(word)
+        add, mult, _ = scalar_ops(N, ES)
+        mult2 = mu_table(self.r_mu).tolist()
+        dt = unary_tables()[1].tolist()
+        x, y, clk_dda = self.x, self.y, self.clk_dda
+        for i in range(1, n):
+            out[i] = (x << N) | y
+            clk_dda ^= 1
+            if clk_dda:
+                w_sub2 = add(mult(mult2[x], y), neg(x))
+                x, y = add(dt[y], x), add(dt[w_sub2], y)
+        self.x, self.y, self.clk_dda = x, y, clk_dda
+        return out
+
+    def burst_words(self, words):
+        """
+        One frame per word of `words` (e.g. a mu schedule), each sending its
+        own word: the DDA steps with the mu of the frame before.
+
+        Returns:
+        uint32 array of the words read back
+        """
+        mus = (np.asarray(words, dtype=np.int64) & mask(N)).tolist()
+        out = np.empty(len(mus), dtype=np.uint32)
+        add, mult, _ = scalar_ops(N, ES)
+        sub1, dt = (table.tolist() for table in unary_tables())
+        x, y, clk_dda, r_mu = self.x, self.y, self.clk_dda, self.r_mu
+        for i, mu in enumerate(mus):
+            out[i] = (x << N) | y
+            clk_dda ^= 1
+            if clk_dda:
+                w_sub2 = add(mult(mult(r_mu, sub1[x]), y), neg(x))
+                x, y = add(dt[y], x), add(dt[w_sub2], y)
+            r_mu = mu
+        self.x, self.y, self.clk_dda, self.r_mu = x, y, clk_dda, r_mu
+        return out
+
+
+def lanes(mu, icx=IC, icy=IC):
+    """
+    One lane per (mu, icx, icy) combination of the given words (outer
+    product of the three, each a word or a sequence of words).
+
+    Returns:
+    (mu, icx, icy) flat uint16 arrays, mu varying slowest
+    """
+    grid = np.meshgrid(np.atleast_1d(mu), np.atleast_1d(icx), np.atleast_1d(icy), indexing="ij")
+    return tuple(g.ravel().astype(np.uint16) for g in grid)
+
+
+class DdaLanes:
+    """
+    Independent dda modules advanced in lock-step.
+
+    Lane i runs with mu[i] from (icx[i], icy[i]); the three are broadcast
+    together, so a scalar mu with arrays of initial conditions (or the
+    output of `lanes()`) both work. Every clock is one vectorized step for
+    all the lanes.
+
+    With at most `MU_TABLES_MAX` distinct mu, mu * (1 - x * x) is looked up in
+    per mu tables (`mu_table`); with more, building the tables would cost more
+    than it saves and mult2 is computed on every clock instead.
+    """
+
+    MU_TABLES_MAX = 256
+
+    def __init__(self, mu, icx=IC, icy=IC):
+        mu, icx, icy = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=np.uint16)) for v in (mu, icx, icy)))
+        self.mu = mu.copy()
+        self.icx = icx.copy()
+        self.icy = icy.copy()
+
+        self._sub1, self._dt = unary_tables()
+        mus, self._mu_index = np.unique(self.mu, return_inverse=True)
+        if len(mus) <= self.MU_TABLES_MAX:
+            self._mult2 = np.stack([mu_table(int(m)) for m in mus])
+        else:
+            self._mult2 = None
+        self.reset()
+
+    def __len__(self):
+        return len(self.mu)
+
+    def reset(self):
+        """load the initial conditions, as rst_n does"""
+        self.x = self.icx.copy()
+        self.y = self.icy.copy()
+        self.clocks = 0
+
+    def step(self):
+        x, y = self.x, self.y
+        if self._mult2 is not None:
+            w_mult2 = self._mult2[self._mu_index, x]
+        else:
+            w_mult2 = posit_mult_array(self.mu, self._sub1[x])
+        w_sub2 = posit_add_array(posit_mult_array(w_mult2, y), neg(x))
+        self.x, self.y = posit_add_array(self._dt[y], x), posit_add_array(self._dt[w_sub2], y)
+        self.clocks += 1
+
+    def advance(self, n):
+        """clock all lanes `n` times without recording the states"""
+        for _ in range(n):
+            self.step()
+
+    def run(self, n):
+        """
+        Clock all lanes `n` times, recording the states.
+
+        Returns:
+        (n, lanes, 2) uint16 array, row 0 being the state before the first
+        clock and row i the state i clocks later (same convention as `run()`),
+        so that consecutive calls chain without repeating a state
+        """
+        xy = np.empty((n, len(self), 2), dtype=np.uint16)
+        for i in range(n):
+            xy[i, :, 0] = self.x
+            xy[i, :, 1] = self.y
+            self.step()
+        return xy
+
+
+def run_lanes(mu, n, icx=IC, icy=IC):
+    """`run()` for many lanes at once: (n, lanes, 2) uint16 array, see `DdaLanes`."""
+    return DdaLanes(mu, icx, icy).run(n)
+
+
+def pack(x, y):
+    """(x, y) words to the 32-bit word the chip sends, x in the 16 MSB"""
+    return (x << N) | y
+
+
+def unpack(xy):
+    """32-bit word to (x, y) words"""
+    return xy >> N, xy & mask(N)
+
+
+def successor(mu, xy):
+    """
+    Next 32-bit state of every 32-bit state in `xy` (uint32 array), one
+    clock of the dda module with the `mu` word (or one mu word per state).
+    The DDA as a map on 2 ** 32 states, see basins.py.
+    """
+    x, y = (w.astype(np.uint16) for w in unpack(np.asarray(xy, dtype=np.uint32)))
+    sub1, dt = unary_tables()
+    if np.ndim(mu) == 0:
+        w_mult2 = mu_table(int(mu))[x]
+    else:
+        w_mult2 = posit_mult_array(np.asarray(mu, dtype=np.uint16), sub1[x])
+    w_sub2 = posit_add_array(posit_mult_array(w_mult2, y), neg(x))
+    x, y = posit_add_array(dt[y], x), posit_add_array(dt[w_sub2], y)
+    return pack(x.astype(np.uint32), y.astype(np.uint32))
+
+
+class Trajectory:
+    """
+    A deterministic DDA trajectory stored as prefix + cycle.
+
+    The DDA state is the 32-bit (x, y) word, so every trajectory ends up
+    periodic: states 0 .. transient - 1 form the prefix and the following
+    `period` states repeat forever. Any state n is then served in O(1).
+    When no cycle was found (`period` is None) only the prefix is known.
+    """
+
+    def __init__(self, states, transient, period=None):
+        states = np.asarray(states, dtype=np.uint32)
+        self.transient = transient
+        self.period = period
+        self.prefix = states[:transient]
+        self.cycle = states[transient : transient + period] if period else states[:0]
+        self._states = np.concatenate([self.prefix, self.cycle])
+
+    def index(self, n):
+        """position of state(s) `n` in prefix + cycle"""
+        n = np.asarray(n, dtype=np.int64)
+        if self.period is None:
+            if np.any(n >= self.transient):
+                raise IndexError("no cycle found, only the first {} states are known".format(self.transient))
+            return n
+        return np.where(n < self.transient, n, self.transient + (n - self.transient) % self.period)
+
+    def packed(self, n):
+        """32-bit state word(s) at step(s) `n`"""
+        return self._states[self.index(n)]
+
+    def __getitem__(self, n):
+        """(x, y) words of state `n`"""
+        return unpack(int(self.packed(n)))
+
+    def states(self, n):
+        """first `n` states as a (n, 2) uint16 array, like `run()`"""
+        xy = self.packed(np.arange(n))
+        return np.stack(unpack(xy), axis=-1).astype(np.uint16)
+
+    def frames(self, n):
+        """first `n` SPI frames after reset, like `spi_frames()`"""
+        return self.states(n // 2 + 1)[(np.arange(n) + 1) // 2]
+
+    def __repr__(self):
+        return f"Trajectory(transient={self.transient}, period={self.period})"
+
+
+class CycleDetector:
+    """
+    Finds the cycle of a sequence of 32-bit DDA states by hashing them as
+    they come in. Works on emulated states as well as on words read from
+    the chip (taking one frame out of two, see `spi_frames()`).
+    """
+
+    def __init__(self):
+        self.states = []
+        self._seen = {}
+        self.transient = None
+        self.period = None
+
+    def push(self, state):
+        """Add the next state. Returns True once the cycle is closed."""
+        i = self._seen.setdefault(state, len(self.states))
+        if i != len(self.states):
+            self.transient = i
+            self.period = len(self.states) - i
+            return True
+        self.states.append(state)
+        return False
+
+    def trajectory(self):
+        if self.period is None:
+            return Trajectory(self.states, len(self.states))
+        return Trajectory(self.states, self.transient, self.period)
+
+
+def find_cycle(mu, icx=IC, icy=IC, max_steps=1 << 24):
+    """
+    Step the dda module until its state repeats.
+
+    Returns:
+    `Trajectory` with the transient length and period, or with `period` None
+    if no state repeated within `max_steps` clocks.
+    """
+    add, mult, _ = scalar_ops(N, ES)
+    mult2 = mu_table(int(mu)).tolist()
+    dt = unary_tables()[1].tolist()
+    detector = CycleDetector()
+    x, y = int(icx), int(icy)
+    for _ in range(max_steps):
+        if detector.push((x << N) | y):
+            break
+        w_sub2 = add(mult(mult2[x], y), neg(x))
+        x, y = add(dt[y], x), add(dt[w_sub2], y)
+    return detector.trajectory()
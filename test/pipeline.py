@@ -0,0 +1,161 @@
+"""
+Streaming acquisition: SPI reader -> decoder -> writer.
+
+    reader thread   read(chunk frames) into a free slot of a preallocated
+                    ring buffer of raw bytes
+    decoder thread  big-endian words of a filled slot -> `Chunk` of words and
+                    decoded x, y; hands the slot back to the reader
+    caller          `sink(chunk)` for every chunk, in order (write a file,
+                    detect a cycle, ...). Returning True stops the acquisition.
+
+The ring buffer slots and the decoded queue are bounded, so a slow sink holds
+the decoder, which holds the reader: memory stays constant however long the
+run. Printing is left to `RateLimitedPrinter`, so that a long run is limited
+by the link and not by the terminal.
+"""
+import queue
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from posit import decode_array
+from burst import frames as burst_frames
+
+# start: index of the first frame of the chunk in the run
+# words: (frames, 2) uint16 (x, y) words as read, x: y: decoded values
+Chunk = namedtuple("Chunk", ["start", "words", "x", "y"])
+
+_DONE = object()
+
+
+class Pipeline:
+    """
+    Parameters:
+    read: read(frames) -> bytes of `frame_size` per frame, e.g. `BurstSpi.exchange`
+    n: frames to acquire
+    chunk: frames per read
+    slots: ring buffer slots (raw chunks in flight)
+    """
+
+    def __init__(self, read, n, chunk=1024, slots=8, frame_size=4, size=16, es=1):
+        self.read = read
+        self.n = n
+        self.chunk = chunk
+        self.frame_size = frame_size
+        self.size = size
+        self.es = es
+        self.ring = np.empty((slots, chunk * frame_size), dtype=np.uint8)
+        self.frames = 0
+
+        self._free = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+        self._filled = queue.Queue(maxsize=slots)
+        self._decoded = queue.Queue(maxsize=slots)
+        self._stop = threading.Event()
+        self._error = None
+
+    def _put(self, q, item):
+        # blocking put that gives up once the run is stopped
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def _reader(self):
+        try:
+            for start in range(0, self.n, self.chunk):
+                slot = self._get(self._free)
+                if slot is _DONE:
+                    return
+                frames = min(self.chunk, self.n - start)
+                data = self.read(frames)
+                if len(data) != frames * self.frame_size:
+                    raise IOError(f"read {len(data)} bytes, expected {frames * self.frame_size}")
+                self.ring[slot, : len(data)] = np.frombuffer(data, dtype=np.uint8)
+                if not self._put(self._filled, (start, slot, frames)):
+                    return
+        except Exception as err:
+            self._error = err
+        self._put(self._filled, _DONE)
+
+    def _decoder(self):
+        while True:
+            item = self._get(self._filled)
+            if item is _DONE:
+                break
+            start, slot, frames = item
+            view = burst_frames(self.ring[slot, : frames * self.frame_size])
+            x = decode_array(view[:, 0], self.size, self.es)
+            y = decode_array(view[:, 1], self.size, self.es)
+            words = view.astype(np.uint16)
+            self._free.put(slot)
+            if not self._put(self._decoded, Chunk(start, words, x, y)):
+                return
+        self._put(self._decoded, _DONE)
+
+    def run(self, sink):
+        """
+        Acquire, calling `sink(chunk)` from this thread for every chunk.
+
+        Returns:
+        number of frames handed to the sink
+        """
+        threads = [threading.Thread(target=t, daemon=True) for t in (self._reader, self._decoder)]
+        for t in threads:
+            t.start()
+        try:
+            while True:
+                chunk = self._get(self._decoded)
+                if chunk is _DONE:
+                    break
+                self.frames = chunk.start + len(chunk.words)
+                if sink(chunk):
+                    break
+        finally:
+            self._stop.set()
+            for t in threads:
+                t.join()
+        if self._error is not None:
+            raise self._error
+        return self.frames
+
+
+class TextWriter:
+    """sink writing "x, y" lines, the fpga.dat format"""
+
+    def __init__(self, f):
+        self.f = f
+
+    def __call__(self, chunk):
+        self.f.writelines(f"{x}, {y}\n" for x, y in zip(chunk.x.tolist(), chunk.y.tolist()))
+
+
+class RateLimitedPrinter:
+    """sink printing the last sample of a chunk at most every `interval` seconds"""
+
+    def __init__(self, interval=1.0, file=sys.stdout):
+        self.interval = interval
+        self.file = file
+        self._last = None
+
+    def __call__(self, chunk):
+        now = time.monotonic()
+        if self._last is None or now - self._last >= self.interval:
+            self._last = now
+            i = len(chunk.words) - 1
+            print(f"frame {chunk.start + i}: x = {chunk.x[i]}, y = {chunk.y[i]}", file=self.file)
@@ -0,0 +1,439 @@
+"""
+Bit-exact models of the posit operators in `src/posit.v`.
+
+`posit_add`, `posit_mult` and `posit_dt_mult` follow the Verilog modules of the
+same name signal by signal (same field widths, same GRS round to nearest even),
+so their outputs are the words the chip produces, which is not always what the
+`mul()` of the Python posit library gives.
+
+Every operator comes as an `_array` variant working on numpy bit arrays
+(broadcast like numpy does) and as a scalar function on ints. The scalar
+functions are a plain int transcription of the same datapath, fed by a table
+of the data_extract_v1 fields of every word, so that a single step of the DDA
+does not pay numpy's per-call overhead.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from posit import mask
+
+# Posit (16,1), as wired in src/top.v
+N = 16
+ES = 1
+
+# dt = 1/256, hard-wired in posit_dt_mult as the fields of 16'h0400
+DT = 0x0400
+
+
+def log2(value):
+    """log2() function of posit.v, i.e. ceil(log2(value))"""
+    value = value - 1
+    n = 0
+    while value > 0:
+        value >>= 1
+        n += 1
+    return n
+
+
+def _u64(x):
+    return np.asarray(x).astype(np.uint64)
+
+
+def _bit(cond):
+    return np.asarray(cond).astype(np.uint64)
+
+
+def _neg(x, width):
+    """two's complement of `x` on `width` bits"""
+    return ((1 << width) - x) & mask(width)
+
+
+def _sub(a, b, width):
+    """a - b on `width` bits"""
+    return (a + (1 << width) - b) & mask(width)
+
+
+def _cat(*fields):
+    """Verilog concatenation of (value, width) pairs, MSB first"""
+    bits = _u64(0)
+    for value, width in fields:
+        bits = (bits << width) | (_u64(value) & mask(width))
+    return bits
+
+
+def _lod(bits, n):
+    """LOD_N: number of leading zeros of `bits` on `n` bits, 0 if `bits` is 0"""
+    bit_length = np.frexp(bits.astype(np.float64))[1].astype(np.uint64)
+    return np.where(bits == 0, 0, n - bit_length).astype(np.uint64)
+
+
+def _check_params(n, es):
+    if n > 16:
+        raise ValueError("RTL models support posits up to 16 bits.")
+    if es < 1 or es > n - 3:
+        raise ValueError("RTL models need 1 <= es <= n - 3.")
+
+
+def data_extract(xin, n=N, es=ES):
+    """
+    data_extract_v1: split an unsigned (already two's complemented) posit
+    into regime sign, regime magnitude, exponent and mantissa.
+    """
+    bs = log2(n)
+    xin = _u64(xin)
+    rc = (xin >> (n - 2)) & 1
+    xin_r = np.where(rc == 1, ~xin & mask(n), xin)
+    k = _lod(((xin_r << 1) & mask(n)) | rc, n)
+    regime = np.where(rc == 1, (k - 1) & mask(bs), k)
+    xin_tmp = (((xin << 2) & mask(n)) << k) & mask(n)
+    exp = xin_tmp >> (n - es)
+    mant = xin_tmp & mask(n - es)
+    return rc, regime, exp, mant
+
+
+def _unpack(bits, n, es):
+    """sign, zero_tmp, inf, zero and extracted fields of one operand"""
+    bits = _u64(bits) & mask(n)
+    s = bits >> (n - 1)
+    zero_tmp = _bit((bits & mask(n - 1)) != 0)
+    inf = s & (zero_tmp ^ 1)
+    zero = (s | zero_tmp) ^ 1
+    xin = np.where(s == 1, _neg(bits, n), bits)
+    rc, regime, exp, mant = data_extract(xin, n, es)
+    m = (zero_tmp << (n - es)) | mant
+    return s, zero_tmp, inf, zero, xin, rc, regime, exp, m
+
+
+def _round(tmp1_o, r_o, n, es):
+    """RNE rounding of the regime-shifted packing: ulp_add = G.(R + S) + L.G.(~(R+S))"""
+    L = (tmp1_o >> (n + 4)) & 1
+    G = (tmp1_o >> (n + 3)) & 1
+    R = (tmp1_o >> (n + 2)) & 1
+    St = _bit((tmp1_o & mask(n + 2)) != 0)
+    R_St = R | St
+    ulp = (G & R_St) | (L & G & (R_St ^ 1))
+    tmp1_o_top = (tmp1_o >> (n + 3)) & mask(n)
+    return np.where(r_o < n - es - 2, (tmp1_o_top + ulp) & mask(n), tmp1_o_top)
+
+
+def _m_reg_exp_op(exp_o, es, bs):
+    """m_reg_exp_op: exponent and regime of a (es + bs + 2)-bit scale"""
+    e_o = exp_o & mask(es)
+    exp_o_s = (exp_o >> (es + bs + 1)) & 1
+    exp_o_low = exp_o & mask(es + bs + 1)
+    exp_oN = np.where(exp_o_s == 1, _neg(exp_o_low, es + bs + 1), exp_o_low)
+    r = exp_oN >> es
+    r_o = np.where((exp_o_s == 0) | ((exp_oN & mask(es)) != 0), (r + 1) & mask(bs + 1), r)
+    return e_o, r_o
+
+
+def _a_reg_exp_op(exp_o, es, bs):
+    """a_reg_exp_op: exponent and regime of a (es + bs + 1)-bit scale"""
+    e_o = exp_o & mask(es)
+    exp_o_s = (exp_o >> (es + bs)) & 1
+    exp_oN = np.where(exp_o_s == 1, _neg(exp_o, es + bs + 1), exp_o)
+    r = (exp_oN >> es) & mask(bs)
+    r_o = np.where((exp_o_s == 0) | ((exp_oN & mask(es)) != 0), (r + 1) & mask(bs), r)
+    return e_o, r_o
+
+
+def _mult(s1, rc1, regime1, e1, m1, s2, rc2, regime2, e2, m2, inf, zero, n, es):
+    """datapath shared by posit_mult and posit_dt_mult, from the extracted fields on"""
+    bs = log2(n)
+    mult_s = s1 ^ s2
+
+    mult_m = m1 * m2
+    mult_m_ovf = (mult_m >> (2 * (n - es) + 1)) & 1
+    mult_mN = np.where(mult_m_ovf == 1, mult_m, (mult_m << 1) & mask(2 * (n - es) + 2))
+
+    r1 = np.where(rc1 == 1, regime1, _neg(regime1, bs + 2))
+    r2 = np.where(rc2 == 1, regime2, _neg(regime2, bs + 2))
+    mult_e = (((r1 << es) | e1) + ((r2 << es) | e2) + mult_m_ovf) & mask(bs + es + 2)
+
+    e_o, r_o = _m_reg_exp_op(mult_e, es, bs)
+
+    mult_e_s = (mult_e >> (es + bs + 1)) & 1
+    lo = n - es + 2
+    tmp_o = _cat(
+        (np.where(mult_e_s == 1, 0, mask(n)), n),
+        (mult_e_s, 1),
+        (e_o, es),
+        (mult_mN >> lo, n - es - 1),
+        (mult_mN >> (lo - 2), 2),
+        (_bit((mult_mN & mask(lo - 2)) != 0), 1),
+    )
+    tmp1_o = (tmp_o << n) >> np.where(r_o >> bs == 1, mask(bs), r_o)
+
+    tmp1_o_rnd = _round(tmp1_o, r_o, n, es)
+    tmp1_oN = np.where(mult_s == 1, _neg(tmp1_o_rnd, n), tmp1_o_rnd)
+
+    is_special = (inf | zero | (((mult_mN >> (2 * (n - es) + 1)) & 1) ^ 1)) == 1
+    return np.where(is_special, inf << (n - 1), (mult_s << (n - 1)) | (tmp1_oN >> 1))
+
+
+def posit_mult_array(in1, in2, n=N, es=ES):
+    """
+    posit_mult on bit arrays.
+
+    Returns:
+    uint16 numpy array, `in1` and `in2` broadcast together
+    """
+    _check_params(n, es)
+    s1, _, inf1, zero1, _, rc1, regime1, e1, m1 = _unpack(in1, n, es)
+    s2, _, inf2, zero2, _, rc2, regime2, e2, m2 = _unpack(in2, n, es)
+    out = _mult(s1, rc1, regime1, e1, m1, s2, rc2, regime2, e2, m2, inf1 | inf2, zero1 & zero2, n, es)
+    return out.astype(np.uint16)
+
+
+def posit_dt_mult_array(in1, n=N, es=ES):
+    """
+    posit_dt_mult on a bit array: multiply by the hard-wired dt.
+
+    The second operand is not decoded, its fields are the constants of the
+    Verilog module (regime 4 with rc 0, exponent 0, m2 = 16'h8000).
+
+    Returns:
+    uint16 numpy array with the shape of `in1`
+    """
+    _check_params(n, es)
+    s1, _, inf, zero, _, rc1, regime1, e1, m1 = _unpack(in1, n, es)
+    zero_u = _u64(0)
+    m2 = _u64(0x8000 & mask(n - es + 1))
+    out = _mult(s1, rc1, regime1, e1, m1, zero_u, zero_u, _u64(4), zero_u, m2, inf, zero, n, es)
+    return out.astype(np.uint16)
+
+
+def posit_add_array(in1, in2, n=N, es=ES):
+    """
+    posit_add on bit arrays. Subtraction is done, like in dda.v, by adding
+    the two's complement of the second operand.
+
+    Returns:
+    uint16 numpy array, `in1` and `in2` broadcast together
+    """
+    _check_params(n, es)
+    bs = log2(n)
+    s1, _, inf1, zero1, xin1, rc1, regime1, e1, m1 = _unpack(in1, n, es)
+    s2, _, inf2, zero2, xin2, rc2, regime2, e2, m2 = _unpack(in2, n, es)
+    inf = inf1 | inf2
+    zero = zero1 & zero2
+
+    # Large Checking and Assignment
+    in1_gt_in2 = (xin1 & mask(n - 1)) >= (xin2 & mask(n - 1))
+    ls = np.where(in1_gt_in2, s1, s2)
+    op = (s1 ^ s2) ^ 1
+    lrc = np.where(in1_gt_in2, rc1, rc2)
+    src = np.where(in1_gt_in2, rc2, rc1)
+    lr = np.where(in1_gt_in2, regime1, regime2)
+    sr = np.where(in1_gt_in2, regime2, regime1)
+    le = np.where(in1_gt_in2, e1, e2)
+    se = np.where(in1_gt_in2, e2, e1)
+    lm = np.where(in1_gt_in2, m1, m2)
+    sm = np.where(in1_gt_in2, m2, m1)
+
+    # Exponent Difference: Lower Mantissa Right Shift Amount
+    lr_N = np.where(lrc == 1, lr, _neg(lr, bs + 1))
+    sr_N = np.where(src == 1, sr, _neg(sr, bs + 1))
+    diff = _sub((lr_N << es) | le, (sr_N << es) | se, es + bs + 2)
+    exp_diff = np.where(((diff >> bs) & mask(es + 1)) != 0, mask(bs), diff & mask(bs))
+
+    # DSR Right Shifting, Mantissa Addition
+    if es >= 2:
+        DSR_right_in = sm << (es - 1)
+        add_m_in1 = lm << (es - 1)
+    else:
+        DSR_right_in = sm & mask(n)
+        add_m_in1 = lm & mask(n)
+    DSR_right_out = DSR_right_in >> exp_diff
+    add_m = np.where(op == 1, add_m_in1 + DSR_right_out, _sub(add_m_in1, DSR_right_out, n + 1)) & mask(n + 1)
+    mant_ovf = add_m >> (n - 1)
+
+    # LOD, DSR Left Shifting
+    LOD_in = ((((add_m >> n) | (add_m >> (n - 1))) & 1) << (n - 1)) | (add_m & mask(n - 1))
+    left_shift = _lod(LOD_in, n)
+    DSR_left_out_t = ((add_m >> 1) << left_shift) & mask(n)
+    DSR_left_out = np.where(DSR_left_out_t >> (n - 1) == 1, DSR_left_out_t, (DSR_left_out_t << 1) & mask(n))
+
+    # Exponent and Regime Computation
+    le_o_tmp = _sub((lr_N << es) | le, left_shift, es + bs + 2)
+    le_o = (le_o_tmp + (mant_ovf >> 1)) & mask(es + bs + 2)
+    e_o, r_o = _a_reg_exp_op(le_o & mask(es + bs + 1), es, bs)
+
+    # Exponent and Mantissa Packing
+    le_o_s = (le_o >> (es + bs)) & 1
+    if es > 2:
+        tmp_o = _cat(
+            (np.where(le_o_s == 1, 0, mask(n)), n),
+            (le_o_s, 1),
+            (e_o, es),
+            (DSR_left_out >> (es - 2), n - es + 1),
+            (_bit((DSR_left_out & mask(es - 2)) != 0), 1),
+        )
+    else:
+        tmp_o = _cat(
+            (np.where(le_o_s == 1, 0, mask(n)), n),
+            (le_o_s, 1),
+            (e_o, es),
+            (DSR_left_out, n - 1),
+            (0, 3 - es),
+        )
+    tmp1_o = (tmp_o << n) >> r_o
+
+    tmp1_o_rnd = _round(tmp1_o, r_o, n, es)
+    tmp1_oN = np.where(ls == 1, _neg(tmp1_o_rnd, n), tmp1_o_rnd)
+
+    is_special = (inf | zero | ((DSR_left_out >> (n - 1)) ^ 1)) == 1
+    out = np.where(is_special, inf << (n - 1), (ls << (n - 1)) | (tmp1_oN >> 1))
+    return out.astype(np.uint16)
+
+
+@lru_cache(maxsize=None)
+def scalar_ops(n=N, es=ES):
+    """
+    Scalar (int) posit_add, posit_mult and posit_dt_mult for P<n,es>.
+
+    Returns:
+    (add, mult, dt_mult) functions, built once per format
+    """
+    _check_params(n, es)
+    bs = log2(n)
+    words = np.arange(1 << n, dtype=np.uint64)
+    fields = list(zip(*(np.broadcast_to(f, words.shape).tolist() for f in _unpack(words, n, es))))
+
+    mask_n, mask_es = mask(n), mask(es)
+    sign_shift = n - 1
+    round_limit = n - es - 2
+    mask_L_R_St = (1 << (n + 4)) | mask(n + 3)
+    # posit_mult
+    m_ovf_shift = 2 * (n - es) + 1
+    mask_mult_m = mask(2 * (n - es) + 2)
+    mask_r = mask(bs + 2)
+    mask_mult_e = mask(bs + es + 2)
+    mask_mult_e_low = mask(es + bs + 1)
+    lo = n - es + 2
+    mask_mant = mask(n - es - 1)
+    mask_sticky = mask(lo - 2)
+    mask_r_o = mask(bs + 1)
+    mask_bs = mask(bs)
+    # posit_add
+    mask_regime_N = mask(bs + 1)
+    mask_diff = mask(es + bs + 2)
+    mask_add_m = mask(n + 1)
+    mask_low = mask(n - 1)
+    mask_le_o = mask(es + bs + 1)
+
+    def lod(bits):
+        return n - bits.bit_length() if bits else 0
+
+    def pack_round(sign, fill_s, e_o, body, r_o, shift):
+        """tmp_o packing, regime shift, RNE rounding (G.(L + R + S)) and final output"""
+        tmp_o = ((0 if fill_s else mask_n) << (n + 3)) | (fill_s << (n + 2)) | (e_o << (n - es + 2)) | body
+        tmp1_o = (tmp_o << n) >> shift
+        tmp1_o_rnd = (tmp1_o >> (n + 3)) & mask_n
+        if r_o < round_limit and (tmp1_o >> (n + 3)) & 1 and tmp1_o & mask_L_R_St:
+            tmp1_o_rnd = (tmp1_o_rnd + 1) & mask_n
+        tmp1_oN = -tmp1_o_rnd & mask_n if sign else tmp1_o_rnd
+        return (sign << sign_shift) | (tmp1_oN >> 1)
+
+    def mult_core(s1, rc1, regime1, e1, m1, s2, rc2, regime2, e2, m2, inf, zero):
+        mult_m = m1 * m2
+        mult_m_ovf = mult_m >> m_ovf_shift
+        mult_mN = mult_m if mult_m_ovf else (mult_m << 1) & mask_mult_m
+        if inf or zero or not mult_mN >> m_ovf_shift:
+            return inf << sign_shift
+
+        r1 = regime1 if rc1 else -regime1 & mask_r
+        r2 = regime2 if rc2 else -regime2 & mask_r
+        mult_e = (((r1 << es) | e1) + ((r2 << es) | e2) + mult_m_ovf) & mask_mult_e
+
+        # m_reg_exp_op
+        mult_e_s = mult_e >> (es + bs + 1)
+        exp_oN = -mult_e & mask_mult_e_low if mult_e_s else mult_e & mask_mult_e_low
+        r_o = exp_oN >> es
+        if not mult_e_s or exp_oN & mask_es:
+            r_o = (r_o + 1) & mask_r_o
+
+        body = (
+            (((mult_mN >> lo) & mask_mant) << 3)
+            | (((mult_mN >> (lo - 2)) & 3) << 1)
+            | (1 if mult_mN & mask_sticky else 0)
+        )
+        return pack_round(s1 ^ s2, mult_e_s, mult_e & mask_es, body, r_o, mask_bs if r_o >> bs else r_o)
+
+    def mult(in1, in2):
+        s1, _, inf1, zero1, _, rc1, regime1, e1, m1 = fields[in1]
+        s2, _, inf2, zero2, _, rc2, regime2, e2, m2 = fields[in2]
+        return mult_core(s1, rc1, regime1, e1, m1, s2, rc2, regime2, e2, m2, inf1 | inf2, zero1 & zero2)
+
+    m2_dt = 0x8000 & mask(n - es + 1)
+
+    def dt_mult(in1):
+        s1, _, inf, zero, _, rc1, regime1, e1, m1 = fields[in1]
+        return mult_core(s1, rc1, regime1, e1, m1, 0, 0, 4, 0, m2_dt, inf, zero)
+
+    def add(in1, in2):
+        s1, _, inf1, zero1, xin1, rc1, regime1, e1, m1 = fields[in1]
+        s2, _, inf2, zero2, xin2, rc2, regime2, e2, m2 = fields[in2]
+        inf = inf1 | inf2
+
+        if (xin1 & mask_low) >= (xin2 & mask_low):
+            ls, lrc, lr, le, lm, src, sr, se, sm = s1, rc1, regime1, e1, m1, rc2, regime2, e2, m2
+        else:
+            ls, lrc, lr, le, lm, src, sr, se, sm = s2, rc2, regime2, e2, m2, rc1, regime1, e1, m1
+
+        lr_N = lr if lrc else -lr & mask_regime_N
+        sr_N = sr if src else -sr & mask_regime_N
+        l_scale = (lr_N << es) | le
+        diff = (l_scale - ((sr_N << es) | se)) & mask_diff
+        exp_diff = mask_bs if (diff >> bs) & mask(es + 1) else diff & mask_bs
+
+        if es >= 2:
+            add_m_in1, DSR_right_in = lm << (es - 1), sm << (es - 1)
+        else:
+            add_m_in1, DSR_right_in = lm & mask_n, sm & mask_n
+        DSR_right_out = DSR_right_in >> exp_diff
+        if s1 == s2:
+            add_m = (add_m_in1 + DSR_right_out) & mask_add_m
+        else:
+            add_m = (add_m_in1 - DSR_right_out) & mask_add_m
+        mant_ovf = add_m >> (n - 1)
+
+        left_shift = lod(((((add_m >> n) | (add_m >> (n - 1))) & 1) << (n - 1)) | (add_m & mask_low))
+        DSR_left_out = ((add_m >> 1) << left_shift) & mask_n
+        if not DSR_left_out >> (n - 1):
+            DSR_left_out = (DSR_left_out << 1) & mask_n
+        if inf or (zero1 & zero2) or not DSR_left_out >> (n - 1):
+            return inf << sign_shift
+
+        le_o = ((l_scale - left_shift) + (mant_ovf >> 1)) & mask_diff & mask_le_o
+
+        # a_reg_exp_op
+        le_o_s = le_o >> (es + bs)
+        exp_oN = -le_o & mask_le_o if le_o_s else le_o
+        r_o = (exp_oN >> es) & mask_bs
+        if not le_o_s or exp_oN & mask_es:
+            r_o = (r_o + 1) & mask_bs
+
+        if es > 2:
+            body = (((DSR_left_out >> (es - 2)) & mask(n - es + 1)) << 1) | (1 if DSR_left_out & mask(es - 2) else 0)
+        else:
+            body = (DSR_left_out & mask_low) << (3 - es)
+        return pack_round(ls, le_o_s, le_o & mask_es, body, r_o, r_o)
+
+    return add, mult, dt_mult
+
+
+def posit_mult(in1, in2, n=N, es=ES):
+    """posit_mult on two posit words (ints). Returns the output word."""
+    return scalar_ops(n, es)[1](in1, in2)
+
+
+def posit_dt_mult(in1, n=N, es=ES):
+    """posit_dt_mult on a posit word (int). Returns the output word."""
+    return scalar_ops(n, es)[2](in1)
+
+
+def posit_add(in1, in2, n=N, es=ES):
+    """posit_add on two posit words (ints). Returns the output word."""
+    return scalar_ops(n, es)[0](in1, in2)
@@ -0,0 +1,232 @@
+"""
+mu sweeps sharded over several boards.
+
+Every (mu, n) job of the sweep records `n` frames with `mu` sent in each of
+them. Jobs are dealt round-robin to one worker thread per device; a worker
+whose queue runs dry steals from the back of the longest other queue, so
+fast boards end up doing more of the sweep. A job that fails with a link
+error (`backend.LINK_ERRORS`, UsbToolsError included) is put back for any
+worker to pick up, up to `retries` times; a job failing with any other error
+is given up at once. Either way the device is reopened; a device that cannot
+be reopened is dropped and its jobs stolen by the others.
+
+The chip has no reset over SPI: a job starts from where the previous job on
+the same board left the DDA, exactly as in controller.py.
+
+Everything lands in one directory:
+
+    index.npy    one INDEX_DTYPE record per job, in sweep order
+    frames.npy   (total frames, 2) big-endian uint16 x, y words; the frames of
+                 job i are frames[offset[i] : offset[i] + n[i]]
+    devices.txt  device urls, line i for device i of the index
+
+Usage:
+    python sweep.py directory --mu 0 5 0.25 --n 100000 [--device url ...]
+
+without --device every FT232H found is used ("sim" for simulated boards).
+"""
+import argparse
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from posit import from_double
+from backend import LINK_ERRORS, discover, open_backend
+
+INDEX_DTYPE = np.dtype(
+    [
+        ("mu", "<f8"),
+        ("mu_bits", "<u2"),
+        ("n", "<u8"),
+        ("offset", "<u8"),
+        ("device", "<i2"),
+        ("attempts", "u1"),
+        ("done", "u1"),
+        ("seconds", "<f8"),
+    ]
+)
+
+FRAME_DTYPE = np.dtype(">u2")
+
+
+class Scheduler:
+    """
+    Work stealing over per-device deques of job indexes.
+
+    Parameters:
+    run(device, worker, job): does the job on the device of worker (its index in urls)
+    open_device(url) / close_device(device): per worker setup and teardown
+    """
+
+    def __init__(self, urls, jobs, run, open_device, close_device=None, retries=3, progress=None):
+        self.urls = list(urls)
+        self.run = run
+        self.open_device = open_device
+        self.close_device = close_device
+        self.retries = retries
+        self.progress = progress
+        self.queues = [deque() for _ in self.urls]
+        for i, job in enumerate(jobs):
+            self.queues[i % len(self.urls)].append(job)
+        self.attempts = {}
+        self.failed = []
+        self.done = 0
+        self.total = len(jobs)
+        self._lock = threading.Lock()
+
+    def _next(self, worker):
+        with self._lock:
+            if self.queues[worker]:
+                return self.queues[worker].popleft()
+            victim = max(range(len(self.queues)), key=lambda i: len(self.queues[i]))
+            if self.queues[victim]:
+                return self.queues[victim].pop()
+            return None
+
+    def _worker(self, worker):
+        url = self.urls[worker]
+        try:
+            device = self.open_device(url)
+        except LINK_ERRORS as err:
+            self._log(f"{url}: {err}, dropped")
+            return
+        while True:
+            job = self._next(worker)
+            if job is None:
+                break
+            try:
+                self.run(device, worker, job)
+            except Exception as err:
+                with self._lock:
+                    self.attempts[job] = self.attempts.get(job, 0) + 1
+                    if isinstance(err, LINK_ERRORS) and self.attempts[job] <= self.retries:
+                        # at the back of its queue, where the others steal from
+                        self.queues[worker].append(job)
+                    else:
+                        # out of retries, or not a link error: retrying would not help
+                        self.failed.append(job)
+                self._log(f"{url}: {err!r} on job {job}, reopening")
+                try:
+                    if self.close_device is not None:
+                        self.close_device(device)
+                except Exception:
+                    pass
+                try:
+                    device = self.open_device(url)
+                except LINK_ERRORS as err:
+                    self._log(f"{url}: {err}, dropped")
+                    return
+                continue
+            with self._lock:
+                self.done += 1
+                done = self.done
+            self._log(f"{done}/{self.total} jobs ({url})")
+        if self.close_device is not None:
+            self.close_device(device)
+
+    def _log(self, message):
+        if self.progress is not None:
+            self.progress(message)
+
+    def start(self):
+        """
+        Run all the jobs.
+
+        Returns:
+        jobs that failed, or were left when every device had been dropped
+        """
+        threads = [threading.Thread(target=self._worker, args=(i,)) for i in range(len(self.urls))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        left = [job for q in self.queues for job in q]
+        return self.failed + left
+
+
+def sweep(directory, mus, n, urls=None, freq=1e6, retries=3, chunk=1 << 14, open_device=None, progress=print):
+    """
+    Record `n` frames (an int, or one per mu) for every mu of `mus` (floats),
+    over the devices in `urls` (default: `backend.discover()`).
+
+    Returns:
+    the index (memory-mapped INDEX_DTYPE array)
+    """
+    if urls is None:
+        urls = discover()
+    if not urls:
+        raise ValueError("No device to run the sweep on.")
+    if open_device is None:
+        open_device = lambda url: open_backend(url, freq)
+
+    os.makedirs(directory, exist_ok=True)
+    ns = np.broadcast_to(np.asarray(n, dtype=np.uint64), (len(mus),))
+    index = np.lib.format.open_memmap(
+        os.path.join(directory, "index.npy"), mode="w+", dtype=INDEX_DTYPE, shape=(len(mus),)
+    )
+    index["mu"] = mus
+    index["mu_bits"] = [from_double(x=mu, size=16, es=1).bit_repr() for mu in mus]
+    index["n"] = ns
+    index["offset"] = np.concatenate([[0], np.cumsum(ns)[:-1]]).astype(np.uint64)
+    index["device"] = -1
+    frames = np.lib.format.open_memmap(
+        os.path.join(directory, "frames.npy"), mode="w+", dtype=FRAME_DTYPE, shape=(int(ns.sum()), 2)
+    )
+    with open(os.path.join(directory, "devices.txt"), "w") as f:
+        f.writelines(f"{url}\n" for url in urls)
+
+    def run(backend, worker, job):
+        rec = index[job]
+        tx = int(rec["mu_bits"]).to_bytes(4, byteorder="big")
+        offset, count = int(rec["offset"]), int(rec["n"])
+        index["attempts"][job] += 1
+        start = time.monotonic()
+        for i in range(0, count, chunk):
+            size = min(chunk, count - i)
+            buf = backend.exchange(tx, size)
+            if len(buf) != 4 * size:
+                # a link error: the job is run again
+                raise IOError(f"short read: {len(buf)} of {4 * size} bytes")
+            frames[offset + i : offset + i + size] = np.frombuffer(buf, dtype=FRAME_DTYPE).reshape(-1, 2)
+        index["seconds"][job] = time.monotonic() - start
+        index["device"][job] = worker
+        index["done"][job] = 1
+
+    scheduler = Scheduler(urls, list(range(len(mus))), run, open_device, lambda b: b.close(), retries, progress)
+    failed = scheduler.start()
+    frames.flush()
+    index.flush()
+    if failed and progress is not None:
+        progress(f"{len(failed)} jobs not done: {sorted(failed)}")
+    return index
+
+
+def open_sweep(directory):
+    """(index, frames, urls) of a sweep, index and frames memory-mapped"""
+    index = np.load(os.path.join(directory, "index.npy"), mmap_mode="r")
+    frames = np.load(os.path.join(directory, "frames.npy"), mmap_mode="r")
+    with open(os.path.join(directory, "devices.txt")) as f:
+        urls = f.read().split()
+    return index, frames, urls
+
+
+def job_frames(index, frames, job):
+    """(n, 2) frames of `job`"""
+    offset = int(index["offset"][job])
+    return frames[offset : offset + int(index["n"][job])]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep mu over all the boards")
+    parser.add_argument("directory")
+    parser.add_argument("--mu", type=float, nargs=3, metavar=("START", "STOP", "STEP"), required=True)
+    parser.add_argument("--n", type=int, default=100000, help="frames per mu")
+    parser.add_argument("--device", action="append", help="device url (repeat for several), default: all found")
+    parser.add_argument("--freq", type=float, default=1e6, help="SPI clock (Hz)")
+    args = parser.parse_args()
+
+    mus = np.arange(*args.mu).tolist()
+    sweep(args.directory, mus, args.n, urls=args.device, freq=args.freq)
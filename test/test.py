@@ -4,10 +4,13 @@
 import cocotb
 import os
 import random
+import numpy as np
 from cocotb.clock import Clock
 from cocotb.triggers import Timer
 from cocotb.binary import BinaryValue
 from posit import from_bits, from_double
+from posit_rtl import posit_add, posit_mult, posit_dt_mult, posit_add_array, posit_mult_array, posit_dt_mult_array
+from dda import spi_frames
 
 # Posit parameters
 N = 16
@@ -79,6 +82,68 @@ async def posit_multiplication(dut):
             assert mult.out.value.integer == p_mult.bit_repr()
 
 
+# Edge words: zero, NaR, minpos, maxpos, their neighbours and +-1
+EDGE_WORDS = [0x0000, 0x8000, 0x0001, 0x0002, 0x7fff, 0x7ffe, 0xffff, 0x8001, 0x4000, 0xc000, 0x4001, 0x3fff]
+
+# Round to nearest even ties: 1 + 2^-13 and 1 + 3 * 2^-13 lie halfway between
+# posits (12 fraction bits at 1), as does (1 + 2^-12) * 1.5 = 1.5 + 3 * 2^-13
+ADD_TIES = [(1.0, 2**-13), (1 + 2**-12, 2**-13), (-1.0, -(2**-13)), (2**-13, 1.0)]
+MULT_TIES = [(1 + 2**-12, 1.5), (1.5, 1 + 2**-12), (-(1 + 2**-12), 1.5)]
+
+def operand_pairs(ties, n=2000):
+    pairs = [(a, b) for a in EDGE_WORDS for b in EDGE_WORDS]
+    pairs += [(from_double(x=a, size=N, es=ES).bit_repr(), from_double(x=b, size=N, es=ES).bit_repr()) for a, b in ties]
+    pairs += [(random.getrandbits(N), random.getrandbits(N)) for _ in range(n)]
+    return pairs
+
+# Test bit-exact models of the RTL posit operators
+@cocotb.test()
+async def posit_operators(dut):
+    GL_TEST = resolve_GL_TEST()
+
+    if not GL_TEST:
+        dut._log.info("Testing posit_add, posit_mult and posit_dt_mult against their Python models")
+
+        # No clock and no SPI: the operands are driven straight into one
+        # instance of each operator, one operator at a time.
+        vdp = dut.user_project.van_der_pol
+        mult = vdp.mult3
+        add = vdp.sub_rho_z
+        dt_mult = vdp.int1.mult
+
+        pairs = operand_pairs(MULT_TIES)
+        out = []
+        for a, b in pairs:
+            mult.in1.value = a
+            mult.in2.value = b
+            await Timer(10,'ns')
+            out.append(mult.out.value.integer)
+            assert out[-1] == posit_mult(a, b), f"posit_mult {a:04x} {b:04x}"
+        a, b = np.array(pairs, dtype=np.uint16).T
+        assert np.array_equal(posit_mult_array(a, b), out), "posit_mult_array"
+
+        pairs = operand_pairs(ADD_TIES)
+        out = []
+        for a, b in pairs:
+            add.in1.value = a
+            add.in2.value = b
+            await Timer(10,'ns')
+            out.append(add.out.value.integer)
+            assert out[-1] == posit_add(a, b), f"posit_add {a:04x} {b:04x}"
+        a, b = np.array(pairs, dtype=np.uint16).T
+        assert np.array_equal(posit_add_array(a, b), out), "posit_add_array"
+
+        # one operand: every word
+        words = np.arange(1 << N, dtype=np.uint16)
+        out = []
+        for a in words.tolist():
+            dt_mult.in1.value = a
+            await Timer(10,'ns')
+            out.append(dt_mult.out.value.integer)
+            assert out[-1] == posit_dt_mult(a), f"posit_dt_mult {a:04x}"
+        assert np.array_equal(posit_dt_mult_array(words), out), "posit_dt_mult_array"
+
+
 # Test van der Pol DDA solver
 @cocotb.test()
 async def dda(dut):
@@ -118,6 +183,7 @@ async def dda(dut):
 
     data_x = []
     data_y = []
+    words = []
     for _ in range(64):
         data = await spiExchange(dut,s)
         x = data[0:16]
@@ -127,8 +193,9 @@ async def dda(dut):
         x_bytes = [int("".join(map(str, x[i:i+8])), 2) for i in range(0, len(x), 8) ]
         y_bytes = [int("".join(map(str, y[i:i+8])), 2) for i in range(0, len(y), 8) ]
 
-        p_x = from_bits(int.from_bytes(bytearray(x_bytes),byteorder='big'),N,ES)
-        p_y = from_bits(int.from_bytes(bytearray(y_bytes),byteorder='big'),N,ES)
+        words.append((int.from_bytes(bytearray(x_bytes),byteorder='big'), int.from_bytes(bytearray(y_bytes),byteorder='big')))
+        p_x = from_bits(words[-1][0],N,ES)
+        p_y = from_bits(words[-1][1],N,ES)
         
         f_out.write(f"{p_x.eval()}, {p_y.eval()}\n")
 
@@ -141,4 +208,9 @@ async def dda(dut):
     icy.binstr = "".join(str(i) for i in data_y[0])
     assert icy.binstr ==  "0011000000000000", "Verify y initial condition"
 
+    # Compare with the software model of the DDA
+    expected = spi_frames(p_mu.bit_repr(), len(words))
+    for i, (x, y) in enumerate(words):
+        assert (x, y) == tuple(expected[i]), f"Frame {i} differs from the software model"
+
     f_out.close()
\ No newline at end of file
@@ -0,0 +1,50 @@
+# Burst SPI against the model: pytest test_burst.py
+import numpy as np
+import pytest
+
+from burst import CS_BIT, BurstSpi, FakeFtdi, frame_commands, frames
+from dda import Top, pack
+from posit import encode_array
+
+# /CS of port 0 high then low before the exchange, high after it, like pyftdi
+PROLOG = [CS_BIT, 0]
+EPILOG = [CS_BIT]
+DIRECTION = CS_BIT | 0x03
+
+
+def burst_spi(top, tx=bytes(4)):
+    frame = frame_commands(tx, PROLOG, EPILOG, DIRECTION)
+    return BurstSpi(FakeFtdi(top), frame, len(tx), tx_offset=3 * len(PROLOG) + 3)
+
+
+def read_back(buf):
+    words = frames(buf).astype(np.uint32)
+    return pack(words[:, 0], words[:, 1])
+
+
+def test_exchange():
+    mu = int(encode_array(2.0))
+    spi = burst_spi(Top(mu), mu.to_bytes(4, byteorder="big"))
+    # more frames than fit in one USB transfer
+    n = 2 * spi.frames_max + 10
+    assert np.array_equal(read_back(spi.exchange(n)), Top(mu).burst(mu, n))
+
+
+def test_exchange_words():
+    words = encode_array(np.linspace(0, 4, 3 * burst_spi(Top()).frames_max // 2)).astype(np.uint32)
+    spi = burst_spi(Top())
+    assert np.array_equal(read_back(spi.exchange_words(words)), Top().burst_words(words))
+
+
+
+def test_short_read():
+    class ShortFtdi(FakeFtdi):
+        def read_data_bytes(self, size, attempt=1):
+            return super().read_data_bytes(size - 1, attempt)
+
+    spi = burst_spi(Top())
+    spi.ftdi = ShortFtdi(Top())
+    with pytest.raises(IOError):
+        spi.exchange(10)
+    with pytest.raises(IOError):
+        spi.exchange_words(np.zeros(10, dtype=np.uint32))
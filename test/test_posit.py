@@ -0,0 +1,70 @@
+# Vectorized posit codecs against the scalar ones: pytest test_posit.py
+import numpy as np
+import pytest
+
+from posit import decode_array, decode_table, encode_array, from_bits, from_double, mul, mul_array
+
+rng = np.random.default_rng(0)
+
+
+@pytest.mark.parametrize("size, es", [(16, 1), (16, 0), (16, 2), (8, 0), (8, 1), (8, 3)])
+def test_decode_table(size, es):
+    # every pattern, zero (0) and NaR (inf) included
+    expected = [from_bits(b, size, es).eval() for b in range(1 << size)]
+    table = decode_table(size, es)
+    assert np.array_equal(table, expected)
+    assert table[0] == 0.0 and table[1 << (size - 1)] == np.inf
+
+
+def test_decode_array():
+    bits = np.arange(1 << 16, dtype=np.uint16)
+    assert np.array_equal(decode_array(bits), decode_table())
+    # wider words are masked, big-endian views index the table as they are
+    assert np.array_equal(decode_array(bits.astype(np.uint32) | 0x10000), decode_table())
+    assert np.array_equal(decode_array(bits.astype(">u2")), decode_table())
+
+
+def test_decode_array_32():
+    bits = np.concatenate([[0, 1 << 31, 1, (1 << 31) - 1, (1 << 32) - 1], rng.integers(0, 1 << 32, 5000)])
+    expected = [from_bits(int(b), 32, 2).eval() for b in bits]
+    assert np.array_equal(decode_array(bits.astype(np.uint32), 32, 2), expected)
+
+
+def encoded(x, size, es):
+    return [from_double(x=float(v), size=size, es=es).bit_repr() for v in x]
+
+
+@pytest.mark.parametrize("size, es", [(16, 1), (8, 0), (32, 2)])
+def test_encode_array(size, es):
+    x = rng.standard_normal(20000) * np.exp2(rng.uniform(-4 * size, 4 * size, 20000))
+    specials = [0.0, -0.0, np.inf, -np.inf, np.nan, 1e300, -1e300, 1e-300, -1e-300, 1.0, -1.0]
+    x = np.concatenate([x, specials])
+    assert np.array_equal(encode_array(x, size, es), encoded(x, size, es))
+
+
+def test_encode_array_ties():
+    # halfway between neighbouring posits, and just either side
+    values = np.sort(decode_table()[1 : 1 << 15])
+    mid = (values[:-1] + values[1:]) / 2
+    x = np.concatenate([mid, np.nextafter(mid, 0), np.nextafter(mid, np.inf)])
+    x = np.concatenate([x, -x])
+    assert np.array_equal(encode_array(x), encoded(x, 16, 1))
+
+
+def test_encode_array_range():
+    # past maxpos and below minpos
+    maxpos, minpos = decode_table()[(1 << 15) - 1], decode_table()[1]
+    x = np.array([maxpos, maxpos * 1.5, maxpos * 4, minpos, minpos / 1.5, minpos / 4, minpos * 0.75])
+    x = np.concatenate([x, -x])
+    assert np.array_equal(encode_array(x), encoded(x, 16, 1))
+
+
+@pytest.mark.parametrize("size, es", [(16, 1), (8, 0), (32, 2)])
+def test_mul_array(size, es):
+    nar, maxpos = 1 << (size - 1), (1 << (size - 1)) - 1
+    # zero, NaR, maxpos, minpos, -minpos, -maxpos and 1
+    special = np.array([0, nar, maxpos, 1, (1 << size) - 1, nar + 1, 1 << (size - 2)], dtype=np.uint64)
+    a = np.concatenate([np.repeat(special, len(special)), rng.integers(0, 1 << size, 20000, dtype=np.uint64)])
+    b = np.concatenate([np.tile(special, len(special)), rng.integers(0, 1 << size, 20000, dtype=np.uint64)])
+    expected = [mul(from_bits(int(x), size, es), from_bits(int(y), size, es)).bit_repr() for x, y in zip(a, b)]
+    assert np.array_equal(mul_array(a, b, size, es), expected)
@@ -0,0 +1,87 @@
+# mu sweeps over simulated boards: pytest test_sweep.py
+import numpy as np
+
+from backend import BackendError, SimBackend
+from sweep import Scheduler, sweep
+
+MUS = [0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0]
+
+
+class FlakyBackend(SimBackend):
+    """SimBackend failing its first `failures[0]` bursts, shared over reopens"""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def exchange(self, tx, n):
+        if self.failures[0]:
+            self.failures[0] -= 1
+            raise IOError("USB error")
+        return super().exchange(tx, n)
+
+
+class ShortBackend(SimBackend):
+    """SimBackend returning its first `shorts[0]` bursts cut short"""
+
+    def __init__(self, shorts):
+        super().__init__()
+        self.shorts = shorts
+
+    def exchange(self, tx, n):
+        buf = super().exchange(tx, n)
+        if self.shorts[0]:
+            self.shorts[0] -= 1
+            return buf[: len(buf) // 2]
+        return buf
+
+
+def test_sweep(tmp_path):
+    index = sweep(tmp_path, MUS, 1000, urls=["sim", "sim"], open_device=lambda url: SimBackend(), progress=None)
+    assert index["done"].all()
+    assert set(index["device"]) <= {0, 1}
+
+
+def test_flaky_device(tmp_path):
+    failures = [3]
+    urls = ["flaky", "sim"]
+    open_device = lambda url: FlakyBackend(failures) if url == "flaky" else SimBackend()
+    index = sweep(tmp_path, MUS, 1000, urls=urls, chunk=250, open_device=open_device, progress=None)
+    assert index["done"].all()
+    assert index["attempts"].sum() == len(MUS) + 3
+
+
+def test_short_read(tmp_path):
+    # a job read short is run again, and only recorded once it has all its frames
+    shorts = [2]
+    index = sweep(tmp_path, MUS, 1000, urls=["short"], open_device=lambda url: ShortBackend(shorts), progress=None)
+    assert index["done"].all()
+    assert index["attempts"].sum() == len(MUS) + 2
+    frames = np.load(tmp_path / "frames.npy")
+    assert (frames.view(np.uint32) != 0).all()
+
+
+def test_dead_device(tmp_path):
+    def open_device(url):
+        if url == "dead":
+            raise BackendError("no such device")
+        return SimBackend()
+
+    index = sweep(tmp_path, MUS, 1000, urls=["dead", "sim"], open_device=open_device, progress=None)
+    assert index["done"].all()
+    assert (index["device"] == 1).all()
+
+
+def test_other_error():
+    # not a link error: the job is given up, the other jobs still run
+    done = []
+
+    def run(device, worker, job):
+        if job == 3:
+            raise ValueError("bad job")
+        done.append(job)
+
+    scheduler = Scheduler(["sim"], list(range(8)), run, lambda url: SimBackend(), lambda b: b.close())
+    assert scheduler.start() == [3]
+    assert sorted(done) == [0, 1, 2, 4, 5, 6, 7]
+    assert scheduler.done == 7
@@ -0,0 +1,44 @@
+# Verifier against streams of the model: pytest test_verify.py
+import time
+
+import numpy as np
+
+from dda import Top, unpack
+from pipeline import Chunk
+from posit import encode_array
+from verify import Verifier, check_frames
+
+MU = int(encode_array(0.5))
+
+
+def verify(mu, frames, chunk=4096):
+    verifier = Verifier(mu)
+    for start in range(0, len(frames), chunk):
+        words = np.stack(unpack(frames[start : start + chunk]), axis=1)
+        verifier(Chunk(start, words, None, None))
+    return verifier.check()
+
+
+def test_clean():
+    frames = Top(MU).burst(MU, 20000)
+    assert verify(MU, frames)[1:] == (0, 0, None)
+
+
+def test_link_flips():
+    frames = Top(MU).burst(MU, 20000)
+    hit = np.random.default_rng(1).choice(np.arange(100, len(frames), 7), 50, replace=False)
+    frames[hit] ^= np.uint32(1) << (hit % 32).astype(np.uint32)
+    check = verify(MU, frames)
+    assert check.errors == len(hit) == check.bit_errors
+    assert check.first == hit.min()
+
+
+def test_diverged():
+    # the chip runs another mu: the model never meets the frames again
+    other = int(encode_array(0.75))
+    frames = Top(other).burst(other, 100000)
+    started = time.monotonic()
+    check = verify(MU, frames, chunk=8192)
+    assert time.monotonic() - started < 10
+    # the same as the model run straight from frame 1, the first one checked
+    assert check.errors == check_frames(MU, np.stack(unpack(frames), axis=1)[1:]).errors
@@ -0,0 +1,154 @@
+"""
+Checking frames read from the chip against the model.
+
+The chip cannot be reset over SPI, so `check_frames` starts the model from
+the first frame read: with mu already in r_mu (sent in the frames before),
+every following frame of the burst is known from top.v + dda.v up to the
+phase of clk_dda, which decides whether the first frame steps the DDA. Both
+phases are tried and the closest one kept.
+
+`Verifier` checks a stream instead, frame to frame: each frame must be the
+previous one, or its `dda.successor` on the frames that clock the DDA. The
+transitions are checked in vectorized batches, so the check keeps up with
+the link. After a wrong frame the model goes on from the frame it expected,
+so a bit flipped on the link counts one frame, as in `check_frames`; when
+the model does not meet the frames again within `LONG_CHAIN` frames, the
+chip has diverged and the model runs straight through with `dda.Top`.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from dda import Top, pack, successor, unpack
+
+# frames: frames checked, errors: frames that differ from the model,
+# bit_errors: bits that differ, first: index of the first divergent frame or None
+Check = namedtuple("Check", ["frames", "errors", "bit_errors", "first"])
+
+# frames after a wrong one for the model to meet the stream again, past
+# which `Verifier` takes the chip as diverged
+LONG_CHAIN = 64
+
+
+def _popcount(v):
+    v = v.astype(np.uint32)
+    return int(np.unpackbits(v.view(np.uint8)).sum())
+
+
+def check_frames(mu, words):
+    """
+    Parameters:
+    mu: word sent in every frame (and in the one before)
+    words: (n, 2) x, y words read back
+
+    Returns:
+    `Check`
+    """
+    words = np.asarray(words).astype(np.uint32)
+    packed = pack(words[:, 0], words[:, 1])
+    if len(packed) == 0:
+        return Check(0, 0, 0, None)
+    best = None
+    for clk_dda in (0, 1):
+        top = Top(mu, *(int(w) for w in words[0]))
+        top.clk_dda = clk_dda
+        diff = top.burst(mu, len(packed)) ^ packed
+        wrong = np.flatnonzero(diff)
+        check = Check(len(packed), len(wrong), _popcount(diff), int(wrong[0]) if len(wrong) else None)
+        if best is None or check.errors < best.errors:
+            best = check
+    return best
+
+
+class Verifier:
+    """
+    Pipeline stage (`pipeline.Pipeline` sink) checking the frames of a run
+    against the model, with running totals. `mu` is the word sent in every
+    frame, or the array of the words sent in each frame of a schedule.
+
+    The first `skip` transitions are not checked: the first frame of a run
+    still steps the DDA with the mu held from before.
+    """
+
+    def __init__(self, mu, skip=1):
+        self.mu = mu
+        self.skip = skip
+        self.phase = None
+        self.last = None
+        self.frames = 0
+        self.errors = 0
+        self.bit_errors = 0
+        self.first = None
+
+    def __call__(self, chunk):
+        words = chunk.words.astype(np.uint32)
+        packed = pack(words[:, 0], words[:, 1])
+        if self.last is not None:
+            packed = np.concatenate([[self.last], packed])
+            start = chunk.start - 1
+        else:
+            start = chunk.start
+        if len(packed) < 2:
+            self.last = packed[-1] if len(packed) else self.last
+            return
+        self.last = packed[-1]
+
+        # transition i goes from frame index[i] to index[i] + 1
+        index = start + np.arange(len(packed) - 1)
+        keep = index >= self.skip
+        index, prev, frame = index[keep], packed[:-1][keep], packed[1:][keep]
+        if len(frame) == 0:
+            return
+
+        # frame i + 1 is stepped with the mu sent in frame i - 1
+        mu = self.mu if np.ndim(self.mu) == 0 else np.asarray(self.mu)[index - 1]
+        if self.phase is None:
+            stepped = successor(mu, prev)
+            self.phase = min(
+                (0, 1), key=lambda q: np.count_nonzero(np.where(index % 2 == q, stepped, prev) != frame)
+            )
+        steps = index % 2 == self.phase
+
+        def straight(k, state, count):
+            # expected frames of the `count` transitions from k on, run from `state`
+            top = Top(int(mu if np.ndim(mu) == 0 else mu[k]), *unpack(int(state)))
+            top.clk_dda = 0 if steps[k] else 1
+            if np.ndim(mu) == 0:
+                return top.burst(mu, count + 1)[1:]
+            # frame i of the burst steps with the mu of transition k + i
+            return top.burst_words(np.concatenate([mu[k + 1 : k + count], [0, 0]]))[1:]
+
+        expected = prev.copy()
+        expected[steps] = successor(mu if np.ndim(mu) == 0 else mu[steps], prev[steps])
+        # A wrong frame is not where the chip went on from: the transitions after
+        # it start from the state the model expected instead, until the model
+        # meets the frames again (a bit flipped on the link) or LONG_CHAIN frames
+        # later gives up on them and runs straight to the end (the chip diverged).
+        wrong = np.flatnonzero(expected[:-1] != frame[:-1])
+        at = 0
+        while True:
+            i = np.searchsorted(wrong, at)
+            if i == len(wrong):
+                break
+            k = wrong[i] + 1
+            chain = straight(k, expected[k - 1], min(LONG_CHAIN, len(frame) - k))
+            met = np.flatnonzero(chain == frame[k : k + len(chain)])
+            if len(met):
+                expected[k : k + met[0] + 1] = chain[: met[0] + 1]
+                at = k + met[0] + 1
+            else:
+                expected[k:] = straight(k, expected[k - 1], len(frame) - k) if k + len(chain) < len(frame) else chain
+                break
+        self.last = expected[-1]
+
+        diff = expected ^ frame
+        wrong = np.flatnonzero(diff)
+        self.frames += len(frame)
+        self.errors += len(wrong)
+        self.bit_errors += _popcount(diff[wrong])
+        if self.first is None and len(wrong):
+            self.first = int(index[wrong[0]]) + 1
+
+    def check(self):
+        """running totals, as a `Check`"""
+        return Check(self.frames, self.errors, self.bit_errors, self.first)